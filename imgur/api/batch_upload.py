@@ -0,0 +1,169 @@
+import json
+import logging
+
+from rest_framework import serializers, status
+from rest_framework.parsers import (
+    BaseParser,
+    FormParser,
+    JSONParser,
+    MultiPartParser,
+)
+from rest_framework.exceptions import ParseError
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from drf_yasg.utils import swagger_auto_schema
+
+from django.db import transaction
+
+from imgur.jobs import tracing
+from imgur.jobs.models import ProcessingJob, Image
+from imgur.jobs.profiles import default_output_profiles, parse_output_profiles
+from imgur.jobs.tasks import enqueue_jobs
+from imgur.api.schema import batch_upload_request_body, batch_upload_responses
+from imgur.api.upload import read_products
+
+logger = logging.getLogger(__name__)
+
+MAX_BATCH_JOBS = 500
+
+
+class NDJSONParser(BaseParser):
+    """One job object per line"""
+
+    media_type = "application/x-ndjson"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return {
+                "jobs": [
+                    json.loads(line)
+                    for line in stream.read().decode("utf-8").splitlines()
+                    if line.strip()
+                ]
+            }
+        except ValueError as e:
+            raise ParseError(f"NDJSON parse error - {e}")
+
+
+class ProductSerializer(serializers.Serializer):
+    product_name = serializers.CharField(max_length=255)
+    input_urls = serializers.ListField(
+        child=serializers.URLField(max_length=200), min_length=1
+    )
+
+
+class BatchJobSerializer(serializers.Serializer):
+    webhook_url = serializers.URLField(required=False, allow_null=True)
+    priority = serializers.ChoiceField(
+        choices=ProcessingJob.PRIORITY_CHOICES, default=ProcessingJob.PRIORITY_NORMAL
+    )
+    output_profiles = serializers.JSONField(required=False)
+    products = ProductSerializer(many=True, allow_empty=False)
+
+    def validate_output_profiles(self, value):
+        try:
+            return parse_output_profiles(value)
+        except ValueError as e:
+            raise serializers.ValidationError(str(e))
+
+
+class BatchUploadSerializer(serializers.Serializer):
+    jobs = BatchJobSerializer(many=True, allow_empty=False)
+
+    def validate_jobs(self, value):
+        if len(value) > MAX_BATCH_JOBS:
+            raise serializers.ValidationError(
+                f"At most {MAX_BATCH_JOBS} jobs can be submitted at once"
+            )
+        return value
+
+
+def jobs_from_files(request):
+    """Batch payload for CSV files sharing the form's job options"""
+    products = []
+    for file in request.FILES.getlist("files"):
+        try:
+            products.append(read_products(file))
+        except serializers.ValidationError as e:
+            return None, {"files": [f"{file.name}: {error}" for error in e.detail]}
+
+    options = {
+        key: request.data[key]
+        for key in ("webhook_url", "priority")
+        if request.data.get(key)
+    }
+    if request.data.get("output_profiles"):
+        try:
+            options["output_profiles"] = json.loads(request.data["output_profiles"])
+        except ValueError:
+            return None, {"output_profiles": ["Invalid JSON"]}
+    return {"jobs": [dict(options, products=p) for p in products]}, None
+
+
+def create_jobs(validated_jobs):
+    """Insert all jobs and their images with a few bulk inserts"""
+    jobs = []
+    images = []
+    for spec in validated_jobs:
+        job = ProcessingJob(
+            webhook_url=spec.get("webhook_url"),
+            priority=spec["priority"],
+            output_profiles=spec.get("output_profiles") or default_output_profiles(),
+        )
+        for product in spec["products"]:
+            for url in product["input_urls"]:
+                images.append(
+                    Image(
+                        job=job,
+                        input_url=url,
+                        product_name=product["product_name"],
+                    )
+                )
+                job.total_images += 1
+        jobs.append(job)
+
+    with transaction.atomic():
+        ProcessingJob.objects.bulk_create(jobs)
+        Image.objects.bulk_create(images, batch_size=1000)
+    logger.info("Bulk inserted %d jobs with %d images", len(jobs), len(images))
+    return jobs
+
+
+class BatchUploadView(APIView):
+    parser_classes = [JSONParser, NDJSONParser, MultiPartParser, FormParser]
+
+    @swagger_auto_schema(
+        operation_id="Batch Upload",
+        operation_description=(
+            "Submit many jobs at once, either as several CSV files sharing the "
+            "same options, or as a JSON or NDJSON list of jobs with their "
+            "products and image URLs"
+        ),
+        request_body=batch_upload_request_body,
+        responses=batch_upload_responses,
+        security=[],
+    )
+    def post(self, request):
+        logger.info("Received batch upload request")
+        with tracing.span("job.submit_batch") as span:
+            if request.FILES:
+                data, errors = jobs_from_files(request)
+                if errors:
+                    logger.error("Batch CSV validation failed: %s", errors)
+                    return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+            else:
+                data = request.data
+
+            serializer = BatchUploadSerializer(data=data)
+            if not serializer.is_valid():
+                logger.error("Batch validation failed: %s", serializer.errors)
+                return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+            jobs = create_jobs(serializer.validated_data["jobs"])
+            span.set_attribute("jobs", len(jobs))
+            enqueue_jobs(jobs)
+
+        return Response(
+            {"request_ids": [job.id for job in jobs]},
+            status=status.HTTP_201_CREATED,
+        )
@@ -0,0 +1,67 @@
+import logging
+
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from drf_yasg.utils import swagger_auto_schema
+
+from imgur.jobs.models import ProcessingJob
+from imgur.jobs.tasks import cancel_job, pause_job, resume_job
+from imgur.api.schema import job_id_param, job_control_responses
+
+logger = logging.getLogger(__name__)
+
+
+def control_job(job_id, transition, action):
+    job = ProcessingJob.objects.filter(id=job_id).first()
+    if not job:
+        logger.error("Job not found for job ID: %s", job_id)
+        return Response({"error": "Job not found"}, status=status.HTTP_404_NOT_FOUND)
+
+    if not transition(job.id):
+        job.refresh_from_db()
+        logger.error("Cannot %s %s job ID: %s", action, job.status, job_id)
+        return Response(
+            {"error": f"Cannot {action} a job with status {job.status}"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    job.refresh_from_db()
+    logger.info("Job ID: %s is now %s", job_id, job.status)
+    return Response({"id": job.id, "status": job.status}, status=status.HTTP_200_OK)
+
+
+class CancelJobView(APIView):
+    @swagger_auto_schema(
+        operation_id="Cancel Job",
+        operation_description="Cancel a pending, processing or paused job",
+        manual_parameters=[job_id_param],
+        responses=job_control_responses,
+        security=[],
+    )
+    def post(self, request, job_id):
+        return control_job(job_id, cancel_job, "cancel")
+
+
+class PauseJobView(APIView):
+    @swagger_auto_schema(
+        operation_id="Pause Job",
+        operation_description="Pause a pending or processing job",
+        manual_parameters=[job_id_param],
+        responses=job_control_responses,
+        security=[],
+    )
+    def post(self, request, job_id):
+        return control_job(job_id, pause_job, "pause")
+
+
+class ResumeJobView(APIView):
+    @swagger_auto_schema(
+        operation_id="Resume Job",
+        operation_description="Resume a paused job with its remaining images",
+        manual_parameters=[job_id_param],
+        responses=job_control_responses,
+        security=[],
+    )
+    def post(self, request, job_id):
+        return control_job(job_id, resume_job, "resume")
@@ -38,8 +38,11 @@ class OutputCSVView(APIView):
             images = Image.objects.filter(job=job)
             output = io.StringIO()
             writer = csv.writer(output)
+            # The first profile fills "Output Image Urls", others get a column each
+            extra_profiles = [profile["name"] for profile in job.output_profiles[1:]]
             writer.writerow(
                 ["S. No.", "Product Name", "Input Image Urls", "Output Image Urls"]
+                + [f"Output Image Urls ({name})" for name in extra_profiles]
             )
 
             grouped_images = {}
@@ -51,8 +54,14 @@ class OutputCSVView(APIView):
             index = 1
             for product_name, imgs in grouped_images.items():
                 input_urls = ", ".join([img.input_url for img in imgs])
-                output_urls = ", ".join([img.output_url for img in imgs])
-                writer.writerow([index, product_name, input_urls, output_urls])
+                output_urls = ", ".join([img.output_url or "" for img in imgs])
+                variant_urls = [
+                    ", ".join([img.variants.get(name, "") for img in imgs])
+                    for name in extra_profiles
+                ]
+                writer.writerow(
+                    [index, product_name, input_urls, output_urls] + variant_urls
+                )
                 index += 1
 
             output.seek(0)
@@ -39,6 +39,22 @@ upload_csv_request_body = openapi.Schema(
         "webhook_url": openapi.Schema(
             type=openapi.TYPE_STRING, format=openapi.FORMAT_URI
         ),
+        "priority": openapi.Schema(
+            type=openapi.TYPE_STRING,
+            enum=["LOW", "NORMAL", "HIGH"],
+            default="NORMAL",
+        ),
+        "output_profiles": openapi.Schema(
+            type=openapi.TYPE_STRING,
+            description=(
+                "JSON list of output variants to generate per image, each with a "
+                "name and optional max_width, max_height, format (JPEG, PNG, WEBP) "
+                "and quality (1-95). Defaults to a single 'compressed' variant at "
+                "quality 50."
+            ),
+            example='[{"name": "thumb", "max_width": 200, "max_height": 200}, '
+            '{"name": "full", "quality": 50}]',
+        ),
     },
     required=["file"],
 )
@@ -56,21 +72,108 @@ upload_csv_responses = {
     ),
 }
 
+# Define request body and responses for BatchUploadView
+batch_upload_request_body = openapi.Schema(
+    type=openapi.TYPE_OBJECT,
+    description=(
+        "JSON body, or NDJSON with one job object per line. Alternatively a "
+        "multipart form with several 'files' plus the shared 'webhook_url', "
+        "'priority' and 'output_profiles' fields of the upload API."
+    ),
+    properties={
+        "jobs": openapi.Schema(
+            type=openapi.TYPE_ARRAY,
+            items=openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                properties={
+                    "webhook_url": openapi.Schema(
+                        type=openapi.TYPE_STRING, format=openapi.FORMAT_URI
+                    ),
+                    "priority": openapi.Schema(
+                        type=openapi.TYPE_STRING,
+                        enum=["LOW", "NORMAL", "HIGH"],
+                        default="NORMAL",
+                    ),
+                    "output_profiles": openapi.Schema(
+                        type=openapi.TYPE_ARRAY,
+                        items=openapi.Schema(type=openapi.TYPE_OBJECT),
+                    ),
+                    "products": openapi.Schema(
+                        type=openapi.TYPE_ARRAY,
+                        items=openapi.Schema(
+                            type=openapi.TYPE_OBJECT,
+                            properties={
+                                "product_name": openapi.Schema(
+                                    type=openapi.TYPE_STRING
+                                ),
+                                "input_urls": openapi.Schema(
+                                    type=openapi.TYPE_ARRAY,
+                                    items=openapi.Schema(
+                                        type=openapi.TYPE_STRING,
+                                        format=openapi.FORMAT_URI,
+                                    ),
+                                ),
+                            },
+                            required=["product_name", "input_urls"],
+                        ),
+                    ),
+                },
+                required=["products"],
+            ),
+        ),
+    },
+    required=["jobs"],
+)
+
+batch_upload_responses = {
+    201: openapi.Response(
+        description="Jobs created",
+        examples={
+            "application/json": {
+                "request_ids": [
+                    "019555ad-f492-fec5-b67a-516bf988519d",
+                    "019555ad-f492-3b1c-89a7-1c0e8f4d2a61",
+                ]
+            }
+        },
+    ),
+    400: openapi.Response(
+        description="Invalid jobs or CSV files",
+        examples={
+            "application/json": {"jobs": [{"products": ["This field is required."]}]}
+        },
+    ),
+}
+
 # Define responses for JobStatusView
 job_status_example = {
     "id": "019555ad-f492-fec5-b67a-516bf988519d",
     "status": "completed",
+    "output_profiles": [{"name": "compressed", "quality": 50}],
     "images": [
         {
             "input_url": "https://example.com/image1.jpg",
             "output_url": "https://res.cloudinary.com/demo/image/upload/v1234567890/sample.jpg",
+            "variants": {
+                "compressed": "https://res.cloudinary.com/demo/image/upload/v1234567890/sample.jpg"
+            },
             "status": "processed",
         },
         {
             "input_url": "https://example.com/image2.jpg",
             "output_url": "https://res.cloudinary.com/demo/image/upload/v1234567890/sample.jpg",
+            "variants": {
+                "compressed": "https://res.cloudinary.com/demo/image/upload/v1234567890/sample.jpg"
+            },
             "status": "processed",
         },
+        {
+            "input_url": "https://example.com/missing.jpg",
+            "output_url": None,
+            "variants": {},
+            "status": "failed",
+            "error": "Download failed with HTTP 404",
+        },
     ],
 }
 
@@ -83,6 +186,10 @@ job_status_responses = {
             properties={
                 "id": openapi.Schema(type=openapi.TYPE_STRING),
                 "status": openapi.Schema(type=openapi.TYPE_STRING),
+                "output_profiles": openapi.Schema(
+                    type=openapi.TYPE_ARRAY,
+                    items=openapi.Schema(type=openapi.TYPE_OBJECT),
+                ),
                 "images": openapi.Schema(
                     type=openapi.TYPE_ARRAY,
                     items=openapi.Schema(
@@ -90,7 +197,14 @@ job_status_responses = {
                         properties={
                             "input_url": openapi.Schema(type=openapi.TYPE_STRING),
                             "output_url": openapi.Schema(type=openapi.TYPE_STRING),
+                            "variants": openapi.Schema(
+                                type=openapi.TYPE_OBJECT,
+                                additional_properties=openapi.Schema(
+                                    type=openapi.TYPE_STRING
+                                ),
+                            ),
                             "status": openapi.Schema(type=openapi.TYPE_STRING),
+                            "error": openapi.Schema(type=openapi.TYPE_STRING),
                         },
                     ),
                 ),
@@ -102,3 +216,26 @@ job_status_responses = {
         examples={"application/json": {"error": "Job not found"}},
     ),
 }
+
+# Define responses for job control views (cancel, pause, resume)
+job_control_responses = {
+    200: openapi.Response(
+        description="Job status updated",
+        examples={
+            "application/json": {
+                "id": "019555ad-f492-fec5-b67a-516bf988519d",
+                "status": "CANCELLED",
+            }
+        },
+    ),
+    400: openapi.Response(
+        description="Job cannot change to the requested status",
+        examples={
+            "application/json": {"error": "Cannot resume a job with status COMPLETED"}
+        },
+    ),
+    404: openapi.Response(
+        description="Job not found",
+        examples={"application/json": {"error": "Job not found"}},
+    ),
+}
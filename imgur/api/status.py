@@ -14,7 +14,15 @@ logger = logging.getLogger(__name__)
 class ImageSerializer(serializers.ModelSerializer):
     class Meta:
         model = Image
-        fields = ["id", "input_url", "output_url", "status", "product_name"]
+        fields = [
+            "id",
+            "input_url",
+            "output_url",
+            "variants",
+            "status",
+            "error",
+            "product_name",
+        ]
 
 
 class JobStatusSerializer(serializers.ModelSerializer):
@@ -22,7 +30,7 @@ class JobStatusSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = ProcessingJob
-        fields = ["id", "status", "images"]
+        fields = ["id", "status", "output_profiles", "images"]
 
 
 class JobStatusView(APIView):
@@ -1,57 +1,73 @@
 import io
+import json
 import logging
-import pandas as pd
 
 from rest_framework import serializers, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from drf_yasg.utils import swagger_auto_schema
 
+from imgur.jobs import tracing
 from imgur.jobs.models import ProcessingJob, Image
-from imgur.jobs.tasks import process_images
+from imgur.jobs.profiles import default_output_profiles, parse_output_profiles
+from imgur.jobs.tasks import enqueue_job
 from imgur.api.schema import upload_csv_request_body, upload_csv_responses
 
 logger = logging.getLogger(__name__)
 
 
+EXPECTED_COLUMNS = ["S. No.", "Product Name", "Input Image Urls"]
+
+
+def read_products(file):
+    """Parse an uploaded CSV into products with their input image URLs"""
+    # pandas takes a while to import, only load it when a CSV is uploaded
+    import pandas as pd
+
+    try:
+        file.seek(0)  # Ensure file is read from the beginning
+        decoded_file = file.read().decode("utf-8")
+        logger.debug("Decoded file content: %s", decoded_file)
+        df = pd.read_csv(io.StringIO(decoded_file))
+        logger.debug("CSV DataFrame: %s", df.head())
+    except pd.errors.EmptyDataError:
+        logger.error("CSV file is empty")
+        raise serializers.ValidationError("CSV file is empty")
+    except Exception as e:
+        logger.error("Error reading CSV file: %s", e)
+        raise serializers.ValidationError("CSV file is empty or improperly formatted")
+
+    if list(df.columns) != EXPECTED_COLUMNS:
+        logger.error("Invalid CSV headers: %s", df.columns)
+        raise serializers.ValidationError(
+            "CSV file must have the following columns: 'S. No.', 'Product Name', 'Input Image Urls'"
+        )
+
+    products = []
+    for product_name, input_urls in zip(df["Product Name"], df["Input Image Urls"]):
+        # Empty entries, e.g. of a trailing comma, aren't images
+        urls = []
+        if isinstance(input_urls, str):
+            urls = [url.strip() for url in input_urls.split(",") if url.strip()]
+        if not urls:
+            logger.error("Row without input image URLs: %s", product_name)
+            raise serializers.ValidationError("Every row must have input image URLs")
+        products.append({"product_name": str(product_name), "input_urls": urls})
+    return products
+
+
 class CSVUploadSerializer(serializers.Serializer):
     file = serializers.FileField()
     webhook_url = serializers.URLField(required=False)
 
-    def validate_file(self, value):
+    def validate(self, attrs):
         logger.debug("Starting file validation")
         try:
-            value.seek(0)  # Ensure file is read from the beginning
-            decoded_file = value.read().decode("utf-8")
-            logger.debug("Decoded file content: %s", decoded_file)
-            df = pd.read_csv(io.StringIO(decoded_file))
-            logger.debug("CSV DataFrame: %s", df.head())
-        except pd.errors.EmptyDataError:
-            logger.error("CSV file is empty")
-            raise serializers.ValidationError("CSV file is empty")
-        except Exception as e:
-            logger.error("Error reading CSV file: %s", e)
-            raise serializers.ValidationError(
-                "CSV file is empty or improperly formatted"
-            )
-
-        expected_columns = ["S. No.", "Product Name", "Input Image Urls"]
-        if list(df.columns) != expected_columns:
-            logger.error("Invalid CSV headers: %s", df.columns)
-            raise serializers.ValidationError(
-                "CSV file must have the following columns: 'S. No.', 'Product Name', 'Input Image Urls'"
-            )
-
-        for index, row in df.iterrows():
-            logger.debug("Validating row: %s", row)
-            if len(row) != 3:
-                logger.error("Invalid row length: %s", row)
-                raise serializers.ValidationError(
-                    "Each row must have exactly 3 columns"
-                )
-
+            attrs["products"] = read_products(attrs["file"])
+        except serializers.ValidationError as e:
+            raise serializers.ValidationError({"file": e.detail})
         logger.debug("File validation completed successfully")
-        return value
+        return attrs
 
 
 class UploadCSVView(APIView):
@@ -63,6 +79,10 @@ class UploadCSVView(APIView):
         security=[],
     )
     def post(self, request):
+        with tracing.span("job.submit") as span:
+            return self.submit(request, span)
+
+    def submit(self, request, span):
         logger.info("Received file upload request")
         if "file" not in request.FILES:
             logger.error("No file found in request")
@@ -73,58 +93,55 @@ class UploadCSVView(APIView):
 
         file = request.FILES["file"]
         webhook_url = request.data.get("webhook_url")
+        priority = request.data.get("priority", ProcessingJob.PRIORITY_NORMAL)
         logger.info("Received file: %s", file.name)
 
+        if priority not in dict(ProcessingJob.PRIORITY_CHOICES):
+            logger.error("Invalid priority: %s", priority)
+            return Response(
+                {"error": "Invalid priority"}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        output_profiles = default_output_profiles()
+        if request.data.get("output_profiles"):
+            try:
+                output_profiles = parse_output_profiles(
+                    json.loads(request.data["output_profiles"])
+                )
+            except ValueError as e:
+                logger.error("Invalid output profiles: %s", e)
+                return Response(
+                    {"error": f"Invalid output profiles: {e}"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
         serializer = CSVUploadSerializer(data=request.FILES)
         if not serializer.is_valid():
             logger.error("File validation failed: %s", serializer.errors)
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
         # Create job entry
-        job = ProcessingJob.objects.create(webhook_url=webhook_url)
+        job = ProcessingJob.objects.create(
+            webhook_url=webhook_url, priority=priority, output_profiles=output_profiles
+        )
         logger.info("Created ProcessingJob entry with job ID: %s", job.id)
-
-        # Read CSV and store image URLs
-        try:
-            file.seek(0)  # Reset file pointer before reading
-            decoded_file = file.read().decode("utf-8")
-            if not decoded_file.strip():
-                raise pd.errors.EmptyDataError("CSV file is empty")
-
-            logger.debug("Decoded file content: %s", decoded_file)
-            df = pd.read_csv(io.StringIO(decoded_file))
-            logger.debug("CSV DataFrame: %s", df.head())
-        except pd.errors.EmptyDataError:
-            logger.error("CSV file is empty")
-            return Response(
-                {"error": "CSV file is empty"}, status=status.HTTP_400_BAD_REQUEST
-            )
-        except Exception as e:
-            logger.error("Error reading CSV file: %s", e)
-            return Response(
-                {"error": "CSV file is empty or improperly formatted"},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
+        span.set_attribute("job_id", str(job.id))
 
         images = []
-        for index, row in df.iterrows():
-            product_name = row["Product Name"]
-            input_urls = row["Input Image Urls"].split(",")
-            logger.debug("Product name: %s, Input URLs: %s", product_name, input_urls)
-
-            for url in input_urls:
+        for product in serializer.validated_data["products"]:
+            for url in product["input_urls"]:
                 images.append(
-                    Image(job=job, input_url=url.strip(), product_name=product_name)
+                    Image(job=job, input_url=url, product_name=product["product_name"])
                 )
                 logger.debug(
-                    "Added image URL: %s for product: %s", url.strip(), product_name
+                    "Added image URL: %s for product: %s", url, product["product_name"]
                 )
 
-        Image.objects.bulk_create(images)  # Optimized bulk insert
+        with tracing.span("job.insert_images", images=len(images)):
+            Image.objects.bulk_create(images)  # Optimized bulk insert
         logger.info("Bulk inserted %d images", len(images))
 
         # Trigger Celery task
-        process_images.delay(job.id)
-        logger.info("Triggered Celery task for job ID: %s", job.id)
+        enqueue_job(job, len(images))
 
         return Response({"request_id": job.id}, status=status.HTTP_201_CREATED)
@@ -1,11 +1,17 @@
 from django.urls import path
 
 from .upload import UploadCSVView
+from .batch_upload import BatchUploadView
 from .status import JobStatusView
 from .output_csv import OutputCSVView
+from .control import CancelJobView, PauseJobView, ResumeJobView
 
 urlpatterns = [
     path("upload/", UploadCSVView.as_view(), name="upload"),
+    path("upload/batch/", BatchUploadView.as_view(), name="batch_upload"),
     path("status/<str:job_id>/", JobStatusView.as_view(), name="status"),
     path("output/<uuid:job_id>/", OutputCSVView.as_view(), name="output_csv"),
+    path("cancel/<uuid:job_id>/", CancelJobView.as_view(), name="cancel"),
+    path("pause/<uuid:job_id>/", PauseJobView.as_view(), name="pause"),
+    path("resume/<uuid:job_id>/", ResumeJobView.as_view(), name="resume"),
 ]
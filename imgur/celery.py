@@ -1,5 +1,6 @@
 import os
 from celery import Celery
+from celery.signals import worker_init, worker_process_shutdown
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "imgur.settings")
 
@@ -7,3 +8,26 @@ app = Celery("imgur")
 app.config_from_object("django.conf:settings", namespace="CELERY")
 
 app.autodiscover_tasks()
+
+
+@worker_init.connect
+def start_metrics_server(sender, **kwargs):
+    from celery.concurrency import get_implementation
+    from celery.concurrency.prefork import TaskPool as PreforkPool
+
+    from imgur.jobs.metrics import start_worker_metrics_server
+
+    start_worker_metrics_server(
+        prefork=issubclass(get_implementation(sender.pool_cls), PreforkPool)
+    )
+
+
+@worker_process_shutdown.connect
+def flush_process_telemetry(pid=None, **kwargs):
+    from imgur.jobs import tracing
+
+    tracing.shutdown()
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(pid)
@@ -1,12 +1,19 @@
 from django.contrib import admin
-from .models import ProcessingJob, Image
+from .models import ProcessingJob, Image, SourceImage
 
 
 @admin.register(ProcessingJob)
 class ProcessingJobAdmin(admin.ModelAdmin):
-    list_display = ("id", "status", "created_at", "updated_at")
+    list_display = (
+        "id",
+        "status",
+        "priority",
+        "total_images",
+        "created_at",
+        "updated_at",
+    )
     search_fields = ("id",)
-    list_filter = ("status",)
+    list_filter = ("status", "priority")
     ordering = ("-created_at",)
 
 
@@ -23,3 +30,16 @@ class ImageAdmin(admin.ModelAdmin):
     search_fields = ("id", "job__id", "input_url", "output_url")
     list_filter = ("status",)
     ordering = ("-created_at",)
+
+
+@admin.register(SourceImage)
+class SourceImageAdmin(admin.ModelAdmin):
+    list_display = (
+        "input_url",
+        "etag",
+        "last_modified",
+        "output_url",
+        "updated_at",
+    )
+    search_fields = ("input_url", "output_url")
+    ordering = ("-updated_at",)
@@ -0,0 +1,326 @@
+"""
+Helpers for running the image pipeline offline: a local HTTP server serving
+synthetic images, CSV generation, an in-process stand-in for the broker and
+worker, and a local server for the web app.
+"""
+
+import csv
+import io
+import json
+import logging
+import os
+import resource
+import tempfile
+import threading
+from collections import deque
+from contextlib import contextmanager
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+from unittest import mock
+
+from celery import group
+from celery.app.task import Task
+from celery.signals import before_task_publish
+from PIL import Image as PILImage
+
+from django.core.servers.basehttp import (
+    ThreadedWSGIServer,
+    WSGIRequestHandler,
+    get_internal_wsgi_application,
+)
+from django.db import DEFAULT_DB_ALIAS, connection
+from django.db.backends.signals import connection_created
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+logger = logging.getLogger(__name__)
+
+IMAGE_FORMATS = {"jpeg": "JPEG", "jpg": "JPEG", "png": "PNG", "webp": "WEBP"}
+CONTENT_TYPES = {"JPEG": "image/jpeg", "PNG": "image/png", "WEBP": "image/webp"}
+
+
+@lru_cache(maxsize=None)
+def synthetic_image(width, height, image_format):
+    """Encoded noisy image, so that encoders do real work"""
+    noise = PILImage.effect_noise((width, height), 64)
+    gradient = PILImage.linear_gradient("L").resize((width, height))
+    image = PILImage.merge("RGB", (noise, gradient, noise))
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format, quality=90)
+    return buffer.getvalue()
+
+
+class SyntheticImageHandler(BaseHTTPRequestHandler):
+    """
+    Serves /<width>x<height>/<name>.<ext>, anything else is a 404. Images never
+    change, so conditional requests with their ETag get a 304.
+    """
+
+    def do_GET(self):
+        try:
+            size, name = self.path.split("?")[0].strip("/").split("/")
+            width, height = (int(value) for value in size.split("x"))
+            image_format = IMAGE_FORMATS[name.rsplit(".", 1)[1].lower()]
+        except (ValueError, KeyError, IndexError):
+            self.send_error(404)
+            return
+
+        etag = f'"{width}x{height}-{image_format}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        # Concurrent requests would otherwise all generate the same image
+        with self.server.lock:
+            body = synthetic_image(width, height, image_format)
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPES[image_format])
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+        with self.server.lock:
+            self.server.bytes_sent += len(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ImageServer:
+    """Threaded HTTP server on a free local port, usable as a context manager"""
+
+    def __init__(self, host="127.0.0.1", port=0):
+        self.httpd = ThreadingHTTPServer((host, port), SyntheticImageHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.lock = threading.Lock()
+        self.httpd.bytes_sent = 0
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def bytes_sent(self):
+        """Bytes of image bodies served so far"""
+        return self.httpd.bytes_sent
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self.thread.start()
+        logger.info("Serving synthetic images on %s", self.base_url)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class QuietWSGIRequestHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class AppServer:
+    """The Django app on a threaded WSGI server, usable as a context manager"""
+
+    def __init__(self, host="127.0.0.1", port=0):
+        self.httpd = ThreadedWSGIServer((host, port), QuietWSGIRequestHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.set_app(get_internal_wsgi_application())
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self.thread.start()
+        logger.info("Serving the app on %s", self.base_url)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def localize_csv(data, base_url, size="800x600"):
+    """
+    Point the image URLs of an upload CSV at the synthetic image server,
+    keeping its products and the number of images per product
+    """
+    rows = list(csv.reader(io.StringIO(data)))
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(rows[0])
+    n = 0
+    for row in rows[1:]:
+        urls = []
+        for url in row[2].split(","):
+            ext = urlsplit(url.strip()).path.rsplit(".", 1)[-1].lower()
+            urls.append(
+                f"{base_url}/{size}/{n}.{ext if ext in IMAGE_FORMATS else 'jpeg'}"
+            )
+            n += 1
+        writer.writerow(row[:2] + [", ".join(urls)])
+    return output.getvalue()
+
+
+def generate_csv(
+    base_url, rows, images_per_row=1, sizes=("800x600",), formats=("jpeg",)
+):
+    """CSV in the upload format whose image URLs cycle through sizes and formats"""
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(["S. No.", "Product Name", "Input Image Urls"])
+    n = 0
+    for row in range(1, rows + 1):
+        urls = []
+        for _ in range(images_per_row):
+            size = sizes[n % len(sizes)]
+            ext = formats[n % len(formats)]
+            urls.append(f"{base_url}/{size}/{n}.{ext}")
+            n += 1
+        writer.writerow([row, f"SKU{row}", ", ".join(urls)])
+    return output.getvalue()
+
+
+class InlineBroker:
+    """
+    Captures Celery task dispatches and runs them in-process, one at a time.
+
+    Unlike eager mode, tasks dispatched by a running task are queued instead
+    of executed recursively, so large jobs don't exhaust the stack.
+    """
+
+    def __init__(self):
+        self.queue = deque()
+        self.dispatched = 0
+
+    def apply_async(self, task, args=None, kwargs=None, **options):
+        headers = dict(options.get("headers") or {})
+        before_task_publish.send(sender=task.name, headers=headers)
+        self.queue.append((task, args or (), kwargs or {}, headers))
+        self.dispatched += 1
+
+    @contextmanager
+    def capture(self):
+        broker = self
+
+        def apply_async(task, args=None, kwargs=None, **options):
+            broker.apply_async(task, args, kwargs, **options)
+
+        def apply_group(tasks, args=None, kwargs=None, **options):
+            # Groups publish their tasks directly, not through Task.apply_async
+            for signature in tasks.tasks:
+                signature.apply_async(args, kwargs, **options)
+
+        with mock.patch.object(Task, "apply_async", apply_async), mock.patch.object(
+            group, "apply_async", apply_group
+        ):
+            yield self
+
+    def run(self):
+        while self.queue:
+            task, args, kwargs, headers = self.queue.popleft()
+            task.apply(args=args, kwargs=kwargs, headers=headers)
+
+    @contextmanager
+    def run_in_background(self):
+        """Run dispatched tasks in a worker thread until exit"""
+        stop = threading.Event()
+
+        def work():
+            try:
+                while not stop.is_set():
+                    if self.queue:
+                        self.run()
+                    else:
+                        stop.wait(0.01)
+            finally:
+                connection.close()
+
+        worker = threading.Thread(target=work, daemon=True)
+        worker.start()
+        try:
+            yield self
+        finally:
+            stop.set()
+            worker.join()
+
+
+class QueryCounter:
+    """
+    Counts database queries run through the default connection, including the
+    connections that image processing threads open while capturing
+    """
+
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+        self._connections = []
+
+    def __call__(self, execute, sql, params, many, context):
+        with self._lock:
+            self.count += 1
+        return execute(sql, params, many, context)
+
+    def _install(self, connection, **kwargs):
+        # Image processing threads each open their own connection
+        if (
+            connection.alias == DEFAULT_DB_ALIAS
+            and self not in connection.execute_wrappers
+        ):
+            connection.execute_wrappers.append(self)
+            self._connections.append(connection)
+
+    @contextmanager
+    def capture(self):
+        connection_created.connect(self._install, weak=False)
+        try:
+            with connection.execute_wrapper(self):
+                yield self
+        finally:
+            connection_created.disconnect(self._install)
+            for thread_connection in self._connections:
+                thread_connection.execute_wrappers.remove(self)
+
+
+def peak_rss_mb():
+    """High-water mark of this process' resident set size since it started"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def parse_settings(items):
+    """Setting overrides from NAME=VALUE strings, with JSON values"""
+    overrides = {}
+    for item in items:
+        name, _, value = item.partition("=")
+        try:
+            overrides[name] = json.loads(value)
+        except ValueError:
+            overrides[name] = value
+    return overrides
+
+
+@contextmanager
+def throwaway_database():
+    """Run against a freshly migrated test database, destroyed on exit"""
+    old_name = connection.settings_dict["NAME"]
+    if connection.vendor == "sqlite":
+        # Threads write concurrently; in-memory SQLite and deferred
+        # transactions fail such writes instead of waiting for the lock
+        connection.settings_dict["TEST"]["NAME"] = os.path.join(
+            tempfile.mkdtemp(), "benchmark.sqlite3"
+        )
+        connection.settings_dict["OPTIONS"]["transaction_mode"] = "IMMEDIATE"
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
@@ -0,0 +1,62 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from imgur.jobs.retention import (
+    archive_jobs,
+    create_image_partitions,
+    drop_image_partitions,
+    prune_source_images,
+    prune_task_results,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Archive finished jobs older than the retention period to gzipped JSON "
+        "lines files, delete them in batches, prune old Celery task results "
+        "and stored source image fetches, and create and drop the monthly "
+        "partitions of the image table."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=settings.RETENTION_JOB_DAYS)
+        parser.add_argument(
+            "--result-days", type=int, default=settings.RETENTION_RESULT_DAYS
+        )
+        parser.add_argument(
+            "--archive-dir",
+            default=settings.RETENTION_ARCHIVE_DIR,
+            help="Directory on durable storage, RETENTION_ARCHIVE_DIR by default",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=settings.RETENTION_BATCH_SIZE
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only count the jobs that would be archived",
+        )
+
+    def handle(self, *args, **options):
+        if not options["archive_dir"] and not options["dry_run"]:
+            raise CommandError("Set RETENTION_ARCHIVE_DIR or pass --archive-dir")
+
+        archived = archive_jobs(
+            options["days"],
+            options["archive_dir"],
+            options["batch_size"],
+            dry_run=options["dry_run"],
+        )
+        if options["dry_run"]:
+            self.stdout.write(f"Would archive {archived} jobs")
+            return
+
+        pruned = prune_task_results(options["result_days"], options["batch_size"])
+        sources = prune_source_images(options["days"], options["batch_size"])
+        created = create_image_partitions()
+        dropped = drop_image_partitions(options["days"])
+        self.stdout.write(
+            f"Archived {archived} jobs, pruned {pruned} task results "
+            f"and {sources} stored source image fetches, created {created} "
+            f"and dropped {dropped} image partitions"
+        )
@@ -0,0 +1,229 @@
+import json
+import subprocess
+import sys
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+
+from imgur.jobs.benchmarking import (
+    ImageServer,
+    InlineBroker,
+    QueryCounter,
+    generate_csv,
+    parse_settings,
+    peak_rss_mb,
+    throwaway_database,
+)
+from imgur.jobs.models import ProcessingJob, SourceImage
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark CSV ingest and end-to-end job processing against a local "
+        "image server and a stub storage backend, in a throwaway test database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rows",
+            type=int,
+            nargs="+",
+            default=[1000],
+            help=(
+                "CSV sizes to benchmark, one run per size. With several sizes, "
+                "each runs in a process of its own so that its peak RSS is its own"
+            ),
+        )
+        parser.add_argument("--images-per-row", type=int, default=1)
+        parser.add_argument(
+            "--sizes",
+            nargs="+",
+            default=["800x600"],
+            help="Source image sizes as WIDTHxHEIGHT, used round robin",
+        )
+        parser.add_argument(
+            "--formats",
+            nargs="+",
+            default=["jpeg"],
+            help="Source image formats (jpeg, png, webp), used round robin",
+        )
+        parser.add_argument(
+            "--output-profiles",
+            help="JSON list of output profiles for the benchmark jobs",
+        )
+        parser.add_argument(
+            "--setting",
+            action="append",
+            default=[],
+            metavar="NAME=VALUE",
+            help="Override a setting for the runs, e.g. JOB_CHUNK_SIZE=50",
+        )
+        parser.add_argument(
+            "--resubmit",
+            action="store_true",
+            help="Submit each CSV a second time, as a nightly re-run does",
+        )
+        parser.add_argument("--json", help="Write results to this file")
+        parser.add_argument(
+            "--baseline",
+            help="Results file of a previous run to compare images/sec against",
+        )
+        parser.add_argument(
+            "--max-regression",
+            type=float,
+            default=0.2,
+            help="Fail when images/sec drops by more than this fraction",
+        )
+
+    def handle(self, *args, **options):
+        overrides = {"IMAGE_STORAGE_BACKEND": "imgur.jobs.storage.StubStorage"}
+        overrides.update(parse_settings(options["setting"]))
+
+        if len(options["rows"]) > 1:
+            # The peak RSS of a process covers everything it ran so far
+            results = [
+                self.run_in_subprocess(rows, options) for rows in options["rows"]
+            ]
+        else:
+            with throwaway_database():
+                with override_settings(**overrides), ImageServer() as server:
+                    results = [self.run_benchmark(server, options["rows"][0], options)]
+
+        report = {"settings": overrides, "results": results}
+        if options["json"]:
+            with open(options["json"], "w") as f:
+                json.dump(report, f, indent=2)
+
+        if options["baseline"]:
+            self.compare(results, options["baseline"], options["max_regression"])
+
+    def run_benchmark(self, server, rows, options):
+        data = generate_csv(
+            server.base_url,
+            rows,
+            images_per_row=options["images_per_row"],
+            sizes=options["sizes"],
+            formats=options["formats"],
+        )
+        # Every run starts without stored fetches of earlier runs
+        SourceImage.objects.all().delete()
+        result = {"rows": rows, "images": rows * options["images_per_row"]}
+        result.update(self.submit(server, data, options))
+        if options["resubmit"]:
+            result["resubmit"] = self.submit(server, data, options)
+        result["peak_rss_mb"] = round(peak_rss_mb(), 1)
+
+        self.report(result)
+        if options["resubmit"]:
+            self.report(
+                dict(result["resubmit"], rows=rows, images=result["images"]),
+                "resubmit ",
+            )
+        return result
+
+    def run_in_subprocess(self, rows, options):
+        """Benchmark one CSV size in a fresh process, returning its result"""
+        with tempfile.NamedTemporaryFile(suffix=".json") as results:
+            command = [
+                sys.executable,
+                "manage.py",
+                "benchmark_pipeline",
+                "--rows",
+                str(rows),
+                "--images-per-row",
+                str(options["images_per_row"]),
+                "--sizes",
+                *options["sizes"],
+                "--formats",
+                *options["formats"],
+                "--json",
+                results.name,
+            ]
+            if options["output_profiles"]:
+                command += ["--output-profiles", options["output_profiles"]]
+            for item in options["setting"]:
+                command += ["--setting", item]
+            if options["resubmit"]:
+                command.append("--resubmit")
+
+            process = subprocess.run(command, cwd=settings.BASE_DIR)
+            if process.returncode:
+                raise CommandError(f"Benchmark of {rows} rows failed")
+            return json.load(results)["results"][0]
+
+    def submit(self, server, data, options):
+        """Upload the CSV and run the job, returning its measurements"""
+        upload = SimpleUploadedFile("benchmark.csv", data.encode(), "text/csv")
+        payload = {"file": upload}
+        if options["output_profiles"]:
+            payload["output_profiles"] = options["output_profiles"]
+        client = Client()
+        broker = InlineBroker()
+        bytes_sent = server.bytes_sent
+
+        with broker.capture():
+            with QueryCounter().capture() as ingest_queries:
+                start = time.perf_counter()
+                response = client.post("/api/upload/", payload)
+                ingest_seconds = time.perf_counter() - start
+            if response.status_code != 201:
+                raise CommandError(f"Upload failed: {response.content.decode()}")
+
+            with QueryCounter().capture() as processing_queries:
+                start = time.perf_counter()
+                broker.run()
+                processing_seconds = time.perf_counter() - start
+
+        job = ProcessingJob.objects.get(id=response.json()["request_id"])
+        total_seconds = ingest_seconds + processing_seconds
+        return {
+            "job_status": job.status,
+            "ingest_seconds": round(ingest_seconds, 3),
+            "end_to_end_seconds": round(total_seconds, 3),
+            "images_per_second": round(job.total_images / total_seconds, 2),
+            "ingest_queries": ingest_queries.count,
+            "processing_queries": processing_queries.count,
+            "tasks_dispatched": broker.dispatched,
+            "downloaded_mb": round((server.bytes_sent - bytes_sent) / 2**20, 1),
+        }
+
+    def report(self, result, prefix=""):
+        line = (
+            prefix + "rows={rows} images={images} status={job_status} "
+            "ingest={ingest_seconds}s end_to_end={end_to_end_seconds}s "
+            "images/sec={images_per_second} "
+            "queries={ingest_queries}+{processing_queries} "
+            "tasks={tasks_dispatched} downloaded={downloaded_mb}MB".format(**result)
+        )
+        if "peak_rss_mb" in result:
+            line += f" peak_rss={result['peak_rss_mb']}MB"
+        self.stdout.write(line)
+        if result["job_status"] != ProcessingJob.STATUS_COMPLETED:
+            self.stderr.write(f"{prefix}Job for {result['rows']} rows did not complete")
+
+    def compare(self, results, baseline_path, max_regression):
+        with open(baseline_path) as f:
+            baseline = {r["rows"]: r for r in json.load(f)["results"]}
+
+        regressions = []
+        for result in results:
+            previous = baseline.get(result["rows"])
+            if not previous:
+                continue
+            change = result["images_per_second"] / previous["images_per_second"] - 1
+            self.stdout.write(
+                f"rows={result['rows']} images/sec {previous['images_per_second']}"
+                f" -> {result['images_per_second']} ({change:+.1%})"
+            )
+            if change < -max_regression:
+                regressions.append(result["rows"])
+
+        if regressions:
+            raise CommandError(
+                f"Throughput regressed by more than {max_regression:.0%} "
+                f"for rows={regressions}"
+            )
@@ -0,0 +1,294 @@
+import json
+import math
+import threading
+import time
+from collections import defaultdict
+from contextlib import nullcontext
+
+import requests
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from imgur.jobs.benchmarking import (
+    AppServer,
+    ImageServer,
+    InlineBroker,
+    localize_csv,
+    parse_settings,
+    throwaway_database,
+)
+from imgur.jobs.models import ProcessingJob
+
+ENDPOINTS = ["upload", "status", "output"]
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of sorted values"""
+    if not values:
+        return None
+    return values[max(0, math.ceil(p / 100 * len(values)) - 1)]
+
+
+class LoadStats:
+    """Latencies and errors per endpoint, shared by all virtual users"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def request(self, endpoint, method, url, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = method(url, timeout=60, **kwargs)
+        except requests.RequestException:
+            response = None
+        elapsed = time.perf_counter() - start
+        with self.lock:
+            self.latencies[endpoint].append(elapsed)
+            if response is None or response.status_code >= 400:
+                self.errors[endpoint] += 1
+        return response
+
+    def summarize(self, seconds):
+        results = {}
+        for endpoint in ENDPOINTS:
+            latencies = sorted(self.latencies[endpoint])
+            if not latencies:
+                continue
+            results[endpoint] = {
+                "requests": len(latencies),
+                "errors": self.errors[endpoint],
+                "rps": round(len(latencies) / seconds, 2),
+                **{
+                    f"p{p}_ms": round(percentile(latencies, p) * 1000, 1)
+                    for p in (50, 95, 99)
+                },
+                "max_ms": round(latencies[-1] * 1000, 1),
+            }
+        return results
+
+
+class Command(BaseCommand):
+    help = (
+        "Load test the upload, status and output APIs with concurrent virtual "
+        "users, each uploading example.csv with its images served locally, "
+        "polling the job status and downloading the output CSV. Runs against "
+        "an in-process server and stand-in worker in a throwaway test "
+        "database, or against a running server given with --url."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--url",
+            help=(
+                "Base URL of a running server instead of the in-process one. "
+                "Run it with IMAGE_STORAGE_BACKEND=imgur.jobs.storage.StubStorage "
+                "and CELERY_TASK_ALWAYS_EAGER=true, or with workers."
+            ),
+        )
+        parser.add_argument("--users", type=int, default=10)
+        parser.add_argument(
+            "--batch-files",
+            type=int,
+            default=0,
+            help=(
+                "Upload this many copies of the CSV at once through the batch "
+                "upload API instead of one through the upload API"
+            ),
+        )
+        parser.add_argument(
+            "--duration", type=float, default=30, help="Seconds to run the load"
+        )
+        parser.add_argument(
+            "--csv",
+            default=str(settings.BASE_DIR / "example.csv"),
+            help="Upload CSV whose products and image counts are uploaded",
+        )
+        parser.add_argument(
+            "--image-size",
+            default="800x600",
+            help="Size of the locally served images, as WIDTHxHEIGHT",
+        )
+        parser.add_argument(
+            "--polls",
+            type=int,
+            default=10,
+            help="Status polls per upload before giving up on its output",
+        )
+        parser.add_argument(
+            "--think-time",
+            type=float,
+            default=0.5,
+            help="Seconds a user waits between status polls",
+        )
+        parser.add_argument(
+            "--worker",
+            choices=["inline", "none"],
+            default="inline",
+            help=(
+                "inline runs tasks in a background thread of the in-process "
+                "server; none discards them, so jobs stay pending and only "
+                "uploads and status polls are measured"
+            ),
+        )
+        parser.add_argument(
+            "--setting",
+            action="append",
+            default=[],
+            metavar="NAME=VALUE",
+            help="Override a setting of the in-process server",
+        )
+        parser.add_argument("--json", help="Write results to this file")
+        parser.add_argument(
+            "--baseline",
+            help="Results file of a previous run to compare RPS and p95 against",
+        )
+        parser.add_argument(
+            "--max-regression",
+            type=float,
+            default=0.2,
+            help="Fail when RPS drops or p95 latency grows by more than this fraction",
+        )
+
+    def handle(self, *args, **options):
+        with open(options["csv"]) as f:
+            data = f.read()
+
+        with ImageServer() as images:
+            data = localize_csv(data, images.base_url, options["image_size"])
+            if options["url"]:
+                seconds, stats = self.run_load(
+                    options["url"].rstrip("/"), data, options
+                )
+            else:
+                seconds, stats = self.run_in_process(data, options)
+
+        report = {
+            "users": options["users"],
+            "duration_seconds": round(seconds, 3),
+            "results": stats.summarize(seconds),
+        }
+        self.report(report)
+        if options["json"]:
+            with open(options["json"], "w") as f:
+                json.dump(report, f, indent=2)
+
+        if options["baseline"]:
+            self.compare(
+                report["results"], options["baseline"], options["max_regression"]
+            )
+
+    def run_in_process(self, data, options):
+        overrides = {"IMAGE_STORAGE_BACKEND": "imgur.jobs.storage.StubStorage"}
+        overrides.update(parse_settings(options["setting"]))
+        broker = InlineBroker()
+
+        with throwaway_database(), override_settings(**overrides):
+            worker = (
+                broker.run_in_background()
+                if options["worker"] == "inline"
+                else nullcontext()
+            )
+            with broker.capture(), worker, AppServer() as app:
+                return self.run_load(app.base_url, data, options)
+
+    def run_load(self, base_url, data, options):
+        stats = LoadStats()
+        start = time.perf_counter()
+        deadline = time.monotonic() + options["duration"]
+        users = [
+            threading.Thread(
+                target=self.user, args=(base_url, data, options, deadline, stats)
+            )
+            for _ in range(options["users"])
+        ]
+        for user in users:
+            user.start()
+        for user in users:
+            user.join()
+        return time.perf_counter() - start, stats
+
+    def user(self, base_url, data, options, deadline, stats):
+        """Follows the upload, status and output flow until the deadline"""
+        session = requests.Session()
+        upload = ("example.csv", data, "text/csv")
+        while time.monotonic() < deadline:
+            if options["batch_files"]:
+                response = stats.request(
+                    "upload",
+                    session.post,
+                    f"{base_url}/api/upload/batch/",
+                    files=[("files", upload)] * options["batch_files"],
+                )
+            else:
+                response = stats.request(
+                    "upload",
+                    session.post,
+                    f"{base_url}/api/upload/",
+                    files={"file": upload},
+                )
+            if response is None or response.status_code != 201:
+                time.sleep(options["think_time"])
+                continue
+
+            if options["batch_files"]:
+                # Jobs of a batch are queued in order, the last one finishes last
+                job_id = response.json()["request_ids"][-1]
+            else:
+                job_id = response.json()["request_id"]
+            for _ in range(options["polls"]):
+                time.sleep(options["think_time"])
+                if time.monotonic() >= deadline:
+                    return
+                response = stats.request(
+                    "status", session.get, f"{base_url}/api/status/{job_id}/"
+                )
+                if (
+                    response is not None
+                    and response.ok
+                    and response.json()["status"] == ProcessingJob.STATUS_COMPLETED
+                ):
+                    stats.request(
+                        "output", session.get, f"{base_url}/api/output/{job_id}/"
+                    )
+                    break
+
+    def report(self, report):
+        self.stdout.write(
+            f"users={report['users']} duration={report['duration_seconds']}s"
+        )
+        for endpoint, result in report["results"].items():
+            self.stdout.write(
+                f"{endpoint:<7} requests={result['requests']} "
+                f"errors={result['errors']} rps={result['rps']} "
+                f"p50={result['p50_ms']}ms p95={result['p95_ms']}ms "
+                f"p99={result['p99_ms']}ms max={result['max_ms']}ms"
+            )
+
+    def compare(self, results, baseline_path, max_regression):
+        with open(baseline_path) as f:
+            baseline = json.load(f)["results"]
+
+        regressions = []
+        for endpoint, result in results.items():
+            previous = baseline.get(endpoint)
+            if not previous:
+                continue
+            rps_change = result["rps"] / previous["rps"] - 1
+            p95_change = result["p95_ms"] / previous["p95_ms"] - 1
+            self.stdout.write(
+                f"{endpoint} rps {previous['rps']} -> {result['rps']} "
+                f"({rps_change:+.1%}), p95 {previous['p95_ms']}ms -> "
+                f"{result['p95_ms']}ms ({p95_change:+.1%})"
+            )
+            if rps_change < -max_regression or p95_change > max_regression:
+                regressions.append(endpoint)
+
+        if regressions:
+            raise CommandError(
+                f"Load test regressed by more than {max_regression:.0%} "
+                f"for {regressions}"
+            )
@@ -0,0 +1,133 @@
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# What each kind of process imports before it can serve its first request or task
+TARGETS = {
+    "setup": "import django; django.setup()",
+    "web": (
+        "from django.core.wsgi import get_wsgi_application; "
+        "get_wsgi_application(); "
+        "from django.urls import get_resolver; get_resolver().url_patterns"
+    ),
+    "worker": (
+        "import django; django.setup(); "
+        "from imgur.celery import app; app.loader.import_default_modules()"
+    ),
+}
+
+CHILD = """
+import os, sys, time
+start = time.perf_counter()
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", {settings_module!r})
+{code}
+sys.stdout.write(str(time.perf_counter() - start))
+"""
+
+
+def parse_importtime(output):
+    """(module, self_us, cumulative_us, depth) per line of -X importtime output"""
+    imports = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        imports.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return imports
+
+
+class Command(BaseCommand):
+    help = (
+        "Profile cold start of web, worker or management command processes with "
+        "python -X importtime, reporting import time per package and the "
+        "slowest imports."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--target",
+            nargs="+",
+            choices=sorted(TARGETS),
+            default=["web", "worker"],
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=3,
+            help="Start each target this many times and keep the fastest run",
+        )
+        parser.add_argument("--limit", type=int, default=15)
+        parser.add_argument("--json", help="Write results to this file")
+
+    def handle(self, *args, **options):
+        results = {}
+        for target in options["target"]:
+            runs = [self.run_target(target) for _ in range(max(1, options["repeat"]))]
+            seconds, imports = min(runs, key=lambda run: run[0])
+            results[target] = self.summarize(seconds, imports, options["limit"])
+            self.report(target, results[target])
+
+        if options["json"]:
+            with open(options["json"], "w") as f:
+                json.dump(results, f, indent=2)
+
+    def run_target(self, target):
+        code = CHILD.format(
+            settings_module=os.environ.get(
+                "DJANGO_SETTINGS_MODULE", settings.SETTINGS_MODULE
+            ),
+            code=TARGETS[target],
+        )
+        process = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", code],
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            text=True,
+        )
+        if process.returncode:
+            raise CommandError(f"Starting {target} failed:\n{process.stderr}")
+        return float(process.stdout.strip().splitlines()[-1]), parse_importtime(
+            process.stderr
+        )
+
+    def summarize(self, seconds, imports, limit):
+        # Self times don't overlap, so they add up per package
+        packages = defaultdict(int)
+        for name, self_us, _, _ in imports:
+            packages[name.split(".")[0]] += self_us
+        slowest = sorted(imports, key=lambda i: i[2], reverse=True)
+        return {
+            "startup_seconds": round(seconds, 3),
+            "import_seconds": round(sum(packages.values()) / 1e6, 3),
+            "modules": len(imports),
+            "packages": [
+                {"package": name, "ms": round(us / 1000, 1)}
+                for name, us in sorted(
+                    packages.items(), key=lambda p: p[1], reverse=True
+                )[:limit]
+            ],
+            "slowest_imports": [
+                {"module": name, "cumulative_ms": round(cumulative / 1000, 1)}
+                for name, _, cumulative, _ in slowest[:limit]
+            ],
+        }
+
+    def report(self, target, result):
+        self.stdout.write(
+            f"{target}: startup={result['startup_seconds']}s "
+            f"imports={result['import_seconds']}s modules={result['modules']}"
+        )
+        self.stdout.write("  import time by package (self):")
+        for package in result["packages"]:
+            self.stdout.write(f"    {package['ms']:>8.1f} ms  {package['package']}")
+        self.stdout.write("  slowest imports (cumulative):")
+        for module in result["slowest_imports"]:
+            self.stdout.write(
+                f"    {module['cumulative_ms']:>8.1f} ms  {module['module']}"
+            )
@@ -0,0 +1,78 @@
+"""
+Memory budget for decoded images in a worker process.
+
+Decoded bitmaps are far larger than the downloads (a 6000x4000 RGB image is
+~72 MB), so images are admitted into decoding only while the estimated size of
+all decoded images held by the process stays within WORKER_MEMORY_BUDGET_MB.
+The estimate comes from the image header, before the pixels are decoded.
+"""
+
+import threading
+from functools import lru_cache
+
+from django.conf import settings
+
+from imgur.jobs import metrics
+
+# Bytes per pixel of the modes that use more than one byte per band
+MODE_BYTES_PER_PIXEL = {"I": 4, "F": 4, "I;16": 2, "I;16B": 2, "I;16L": 2}
+# Bytes per pixel of a working copy: a resized variant or an RGB(A) conversion
+WORKING_COPY_BYTES_PER_PIXEL = 4
+
+
+def decoded_size(pil_image):
+    """
+    Estimated peak memory of decoding and rendering an opened, not yet loaded
+    image: the decoded source plus one full size working copy
+    """
+    width, height = pil_image.size
+    bytes_per_pixel = MODE_BYTES_PER_PIXEL.get(
+        pil_image.mode, len(pil_image.getbands())
+    )
+    return width * height * (bytes_per_pixel + WORKING_COPY_BYTES_PER_PIXEL)
+
+
+class MemoryBudget:
+    """Bytes that the threads of a process may reserve at once"""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.reserved = 0
+        self._condition = threading.Condition()
+
+    def _admits(self, nbytes):
+        # An image larger than the whole budget is admitted on its own
+        return self.reserved == 0 or self.reserved + nbytes <= self.limit
+
+    def acquire(self, nbytes):
+        """Block until nbytes fit in the budget, then reserve them"""
+        if not self.limit:
+            return
+        with self._condition:
+            self._condition.wait_for(lambda: self._admits(nbytes))
+            self.reserved += nbytes
+        metrics.MEMORY_RESERVED_BYTES.inc(nbytes)
+
+    def release(self, nbytes):
+        if not self.limit:
+            return
+        with self._condition:
+            self.reserved -= nbytes
+            self._condition.notify_all()
+        metrics.MEMORY_RESERVED_BYTES.dec(nbytes)
+
+    def wait_for_headroom(self):
+        """Block while the budget is used up, to hold back new downloads"""
+        if not self.limit:
+            return
+        with self._condition:
+            self._condition.wait_for(lambda: self.reserved < self.limit)
+
+
+@lru_cache(maxsize=None)
+def _budget(limit_mb):
+    return MemoryBudget(limit_mb * 2**20)
+
+
+def get_budget():
+    return _budget(settings.WORKER_MEMORY_BUDGET_MB)
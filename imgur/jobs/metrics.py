@@ -0,0 +1,160 @@
+import logging
+import os
+import time
+from contextlib import contextmanager
+
+from kombu.exceptions import ChannelError
+from prometheus_client import (
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+    start_http_server,
+)
+from prometheus_client.core import GaugeMetricFamily
+
+from django.conf import settings
+from django.db import models
+
+logger = logging.getLogger(__name__)
+
+STAGE_SECONDS = Histogram(
+    "imgur_image_stage_seconds",
+    "Time spent in each stage of the image pipeline",
+    ["stage"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+DOWNLOAD_BYTES = Histogram(
+    "imgur_image_download_bytes",
+    "Size of downloaded source images",
+    buckets=(10e3, 50e3, 100e3, 250e3, 500e3, 1e6, 2.5e6, 5e6, 10e6, 25e6, 50e6),
+)
+IMAGES_PROCESSED = Counter(
+    "imgur_images_processed_total",
+    "Images that went through the pipeline, by result",
+    ["result"],
+)
+IMAGES_IN_FLIGHT = Gauge(
+    "imgur_images_in_flight",
+    "Images currently being processed",
+    multiprocess_mode="livesum",
+)
+CHUNKS_IN_FLIGHT = Gauge(
+    "imgur_chunks_in_flight",
+    "Image chunks currently being processed",
+    multiprocess_mode="livesum",
+)
+MEMORY_RESERVED_BYTES = Gauge(
+    "imgur_worker_memory_reserved_bytes",
+    "Estimated memory of decoded images held by workers",
+    multiprocess_mode="livesum",
+)
+JOB_DURATION = Histogram(
+    "imgur_job_duration_seconds",
+    "Time from job submission to completion",
+    buckets=(1, 5, 10, 30, 60, 120, 300, 600, 1800, 3600, 7200, 21600),
+)
+JOB_THROUGHPUT = Histogram(
+    "imgur_job_images_per_second",
+    "Images processed per second over the lifetime of a job",
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100),
+)
+
+
+@contextmanager
+def time_stage(stage):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.labels(stage).observe(time.perf_counter() - start)
+
+
+def observe_job_completed(job, completed_at):
+    duration = (completed_at - job.created_at).total_seconds()
+    JOB_DURATION.observe(duration)
+    if duration > 0:
+        JOB_THROUGHPUT.observe(job.total_images / duration)
+
+
+def queue_depth(conn, name):
+    try:
+        declared = conn.default_channel.queue_declare(queue=name, passive=True)
+    except ChannelError:
+        # Redis deletes empty lists, so an empty queue doesn't exist
+        return 0
+    return declared.message_count
+
+
+class PipelineCollector:
+    """Reads queue depth and job counts at scrape time"""
+
+    def collect(self):
+        from imgur.celery import app
+        from imgur.jobs.models import ProcessingJob, Image
+
+        jobs = GaugeMetricFamily(
+            "imgur_jobs", "Processing jobs by status", labels=["status"]
+        )
+        counts = dict(
+            ProcessingJob.objects.values_list("status").annotate(
+                count=models.Count("id")
+            )
+        )
+        for job_status, _ in ProcessingJob.STATUS_CHOICES:
+            jobs.add_metric([job_status], counts.get(job_status, 0))
+        yield jobs
+
+        yield GaugeMetricFamily(
+            "imgur_images_pending",
+            "Images waiting to be processed",
+            value=Image.objects.filter(status=Image.STATUS_PENDING).count(),
+        )
+
+        depth = GaugeMetricFamily(
+            "imgur_queue_depth", "Messages waiting in a Celery queue", labels=["queue"]
+        )
+        try:
+            with app.connection_for_read() as conn:
+                conn.ensure_connection(max_retries=1)
+                for queue in settings.CELERY_TASK_QUEUES:
+                    depth.add_metric([queue.name], queue_depth(conn, queue.name))
+        except Exception as e:
+            logger.warning("Failed to read Celery queue depth, error: %s", str(e))
+        yield depth
+
+
+pipeline_registry = CollectorRegistry()
+pipeline_registry.register(PipelineCollector())
+
+
+def process_registry():
+    """Registry of this process, or of all processes in multiprocess mode"""
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def render_metrics():
+    return generate_latest(process_registry()) + generate_latest(pipeline_registry)
+
+
+def start_worker_metrics_server(prefork=False):
+    port = settings.METRICS_WORKER_PORT
+    if not port:
+        return
+    if prefork and "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        # Tasks run in the child processes, the parent would serve no metrics
+        logger.warning(
+            "Not serving worker metrics on port %s: the prefork pool needs "
+            "PROMETHEUS_MULTIPROC_DIR to collect metrics of its processes",
+            port,
+        )
+        return
+    start_http_server(port, registry=process_registry())
+    logger.info("Serving worker metrics on port %s", port)
@@ -0,0 +1,32 @@
+# Generated by Django 5.1.6 on 2026-10-19 18:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("jobs", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="processingjob",
+            name="chunk_cursor",
+            field=models.UUIDField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="processingjob",
+            name="priority",
+            field=models.CharField(
+                choices=[("LOW", "Low"), ("NORMAL", "Normal"), ("HIGH", "High")],
+                default="NORMAL",
+                max_length=10,
+            ),
+        ),
+        migrations.AddField(
+            model_name="processingjob",
+            name="total_images",
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.1.6 on 2026-10-19 18:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("jobs", "0002_processingjob_priority_chunking"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="processingjob",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("PENDING", "Pending"),
+                    ("PROCESSING", "Processing"),
+                    ("COMPLETED", "Completed"),
+                    ("PAUSED", "Paused"),
+                    ("CANCELLED", "Cancelled"),
+                ],
+                db_index=True,
+                default="PENDING",
+                max_length=20,
+            ),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.1.6 on 2026-10-19 18:22
+
+import imgur.jobs.profiles
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("jobs", "0003_processingjob_paused_cancelled_status"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="image",
+            name="variants",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name="processingjob",
+            name="output_profiles",
+            field=models.JSONField(default=imgur.jobs.profiles.default_output_profiles),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.1.6 on 2026-10-19 18:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("jobs", "0004_output_profiles_variants"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="image",
+            name="error",
+            field=models.CharField(blank=True, default="", max_length=255),
+        ),
+        migrations.AlterField(
+            model_name="image",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("PENDING", "Pending"),
+                    ("PROCESSED", "Processed"),
+                    ("FAILED", "Failed"),
+                ],
+                db_index=True,
+                default="PENDING",
+                max_length=20,
+            ),
+        ),
+    ]
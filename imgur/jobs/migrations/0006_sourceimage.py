@@ -0,0 +1,57 @@
+# Generated by Django 5.1.6 on 2026-10-19 18:27
+
+import django.utils.timezone
+import ulid2
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("jobs", "0005_image_failed_status_error"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SourceImage",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=ulid2.generate_ulid_as_uuid,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        blank=True, default=django.utils.timezone.now, editable=False
+                    ),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("url_hash", models.CharField(max_length=40)),
+                ("profiles_hash", models.CharField(max_length=40)),
+                ("input_url", models.URLField()),
+                ("etag", models.CharField(blank=True, default="", max_length=255)),
+                (
+                    "last_modified",
+                    models.CharField(blank=True, default="", max_length=64),
+                ),
+                (
+                    "content_length",
+                    models.PositiveBigIntegerField(blank=True, null=True),
+                ),
+                ("output_url", models.URLField(blank=True, null=True)),
+                ("variants", models.JSONField(blank=True, default=dict)),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("url_hash", "profiles_hash"), name="unique_source_image"
+                    )
+                ],
+            },
+        ),
+    ]
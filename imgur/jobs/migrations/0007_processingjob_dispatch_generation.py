@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-19 18:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("jobs", "0006_sourceimage"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="processingjob",
+            name="dispatch_generation",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
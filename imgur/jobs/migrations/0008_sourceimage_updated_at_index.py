@@ -0,0 +1,17 @@
+# Generated by Django 5.1.6 on 2026-10-19 18:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("jobs", "0007_processingjob_dispatch_generation"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="sourceimage",
+            index=models.Index(fields=["updated_at"], name="source_image_updated_at"),
+        ),
+    ]
@@ -0,0 +1,92 @@
+import uuid
+from datetime import datetime, timezone
+
+from django.db import migrations
+
+
+def ulid_floor(moment):
+    milliseconds = int(moment.timestamp() * 1000)
+    return uuid.UUID(bytes=milliseconds.to_bytes(6, "big") + bytes(10))
+
+
+def partition_images(apps, schema_editor):
+    """
+    Turn jobs_image into a table partitioned by RANGE (id) on PostgreSQL.
+
+    Existing rows stay where they are: the old table, with its indexes and
+    constraints, is attached as the partition of all IDs before next month.
+    Monthly partitions from then on are created by the retention task, and a
+    default partition takes rows of months it didn't create yet.
+    """
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    now = datetime.now(timezone.utc)
+    next_month = datetime(
+        now.year + now.month // 12, now.month % 12 + 1, 1, tzinfo=timezone.utc
+    )
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT relkind FROM pg_class WHERE oid = 'jobs_image'::regclass"
+        )
+        if cursor.fetchone()[0] == "p":
+            # Already partitioned, e.g. migrated again after reversing
+            return
+
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = 'jobs_image'::regclass"
+        )
+        constraints = cursor.fetchall()
+        cursor.execute(
+            "SELECT c.relname, pg_get_indexdef(i.indexrelid) FROM pg_index i "
+            "JOIN pg_class c ON c.oid = i.indexrelid "
+            "WHERE i.indrelid = 'jobs_image'::regclass AND NOT EXISTS "
+            "(SELECT 1 FROM pg_constraint WHERE conindid = i.indexrelid)"
+        )
+        indexes = cursor.fetchall()
+
+        # Free the names for the partitioned table, which Django introspects
+        cursor.execute("ALTER TABLE jobs_image RENAME TO jobs_image_legacy")
+        for name, _ in constraints:
+            cursor.execute(
+                f'ALTER TABLE jobs_image_legacy RENAME CONSTRAINT "{name}" '
+                f'TO "{name[:56]}_legacy"'
+            )
+        for name, _ in indexes:
+            cursor.execute(f'ALTER INDEX "{name}" RENAME TO "{name[:56]}_legacy"')
+
+        cursor.execute(
+            "CREATE TABLE jobs_image (LIKE jobs_image_legacy INCLUDING DEFAULTS "
+            "INCLUDING STORAGE) PARTITION BY RANGE (id)"
+        )
+        for name, definition in constraints:
+            cursor.execute(
+                f'ALTER TABLE jobs_image ADD CONSTRAINT "{name}" {definition}'
+            )
+        for _, definition in indexes:
+            # Captured before the rename, so they name the new table
+            cursor.execute(definition)
+
+        # Matching indexes and constraints of the old table are attached
+        # rather than built again
+        cursor.execute(
+            "ALTER TABLE jobs_image ATTACH PARTITION jobs_image_legacy "
+            "FOR VALUES FROM (MINVALUE) TO (%s)",
+            [str(ulid_floor(next_month))],
+        )
+        cursor.execute(
+            "CREATE TABLE jobs_image_default PARTITION OF jobs_image DEFAULT"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("jobs", "0008_sourceimage_updated_at_index"),
+    ]
+
+    operations = [
+        # Reversing keeps the partitioned table, which Django uses like a plain one
+        migrations.RunPython(partition_images, migrations.RunPython.noop),
+    ]
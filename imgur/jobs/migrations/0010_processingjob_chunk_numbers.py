@@ -0,0 +1,23 @@
+# Generated by Django 5.1.6 on 2026-10-19 19:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("jobs", "0009_partition_images"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="processingjob",
+            name="chunks_dispatched",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="processingjob",
+            name="chunks_started",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -3,6 +3,8 @@ from ulid2 import generate_ulid_as_uuid
 from django.db import models
 from django.utils import timezone
 
+from imgur.jobs.profiles import default_output_profiles
+
 
 class UUIDAsPrimaryKey(models.Model):
     id = models.UUIDField(
@@ -36,25 +38,54 @@ class ProcessingJob(AuditDates, UUIDAsPrimaryKey):
     STATUS_PENDING = "PENDING"
     STATUS_PROCESSING = "PROCESSING"
     STATUS_COMPLETED = "COMPLETED"
+    STATUS_PAUSED = "PAUSED"
+    STATUS_CANCELLED = "CANCELLED"
 
     STATUS_CHOICES = [
         (STATUS_PENDING, "Pending"),
         (STATUS_PROCESSING, "Processing"),
         (STATUS_COMPLETED, "Completed"),
+        (STATUS_PAUSED, "Paused"),
+        (STATUS_CANCELLED, "Cancelled"),
+    ]
+
+    PRIORITY_LOW = "LOW"
+    PRIORITY_NORMAL = "NORMAL"
+    PRIORITY_HIGH = "HIGH"
+
+    PRIORITY_CHOICES = [
+        (PRIORITY_LOW, "Low"),
+        (PRIORITY_NORMAL, "Normal"),
+        (PRIORITY_HIGH, "High"),
     ]
     status = models.CharField(
         max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING, db_index=True
     )
+    priority = models.CharField(
+        max_length=10, choices=PRIORITY_CHOICES, default=PRIORITY_NORMAL
+    )
     webhook_url = models.URLField(null=True, blank=True)
+    total_images = models.PositiveIntegerField(default=0)
+    output_profiles = models.JSONField(default=default_output_profiles)
+    # Last image ID handed out to a chunk task; images are chunked in ID order.
+    chunk_cursor = models.UUIDField(null=True, blank=True, editable=False)
+    # Bumped on every (re-)dispatch of the job; chunks of older dispatches exit
+    dispatch_generation = models.PositiveIntegerField(default=0, editable=False)
+    # Chunks are numbered as they are dispatched or retried, and the highest
+    # number that started is kept; while it is behind, chunks wait in a queue
+    chunks_dispatched = models.PositiveIntegerField(default=0, editable=False)
+    chunks_started = models.PositiveIntegerField(default=0, editable=False)
 
 
 class Image(AuditDates, UUIDAsPrimaryKey):
     STATUS_PENDING = "PENDING"
     STATUS_PROCESSED = "PROCESSED"
+    STATUS_FAILED = "FAILED"
 
     STATUS_CHOICES = [
         (STATUS_PENDING, "Pending"),
         (STATUS_PROCESSED, "Processed"),
+        (STATUS_FAILED, "Failed"),
     ]
 
     job = models.ForeignKey(
@@ -62,7 +93,36 @@ class Image(AuditDates, UUIDAsPrimaryKey):
     )
     product_name = models.CharField(max_length=255, default="")
     input_url = models.URLField()
+    # URL of the first output profile's variant
     output_url = models.URLField(null=True, blank=True)
+    # Output profile name -> variant URL
+    variants = models.JSONField(default=dict, blank=True)
     status = models.CharField(
         max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING, db_index=True
     )
+    error = models.CharField(max_length=255, blank=True, default="")
+
+
+class SourceImage(AuditDates, UUIDAsPrimaryKey):
+    """
+    Origin validators and outputs of the last fetch of an input URL with a set
+    of output profiles, used to re-fetch it with a conditional GET.
+    """
+
+    url_hash = models.CharField(max_length=40)
+    profiles_hash = models.CharField(max_length=40)
+    input_url = models.URLField()
+    etag = models.CharField(max_length=255, blank=True, default="")
+    last_modified = models.CharField(max_length=64, blank=True, default="")
+    content_length = models.PositiveBigIntegerField(null=True, blank=True)
+    output_url = models.URLField(null=True, blank=True)
+    variants = models.JSONField(default=dict, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["url_hash", "profiles_hash"], name="unique_source_image"
+            )
+        ]
+        # Pruning selects rows not fetched or reused since a cutoff
+        indexes = [models.Index(fields=["updated_at"], name="source_image_updated_at")]
@@ -0,0 +1,84 @@
+"""
+Negative cache for image downloads.
+
+URLs that failed permanently (e.g. 404) are remembered for
+NEGATIVE_CACHE_URL_TTL seconds so that later jobs fail them without a request.
+Hosts that refuse connections HOST_FAILURE_THRESHOLD times in a row are
+skipped for HOST_CIRCUIT_TTL seconds; their images are retried once the
+circuit closes rather than failed. Cache errors never fail a download.
+"""
+
+import hashlib
+import logging
+import math
+import time
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+
+def _url_key(url):
+    return "negative:url:" + hashlib.sha1(url.encode()).hexdigest()
+
+
+def _host(url):
+    return urlsplit(url).netloc.lower()
+
+
+def _open_key(host):
+    return f"negative:host:{host}:open"
+
+
+def known_failure(url):
+    """Reason the URL is known to fail permanently, or None"""
+    try:
+        return cache.get(_url_key(url))
+    except Exception as e:
+        logger.warning("Negative cache lookup failed for URL: %s, error: %s", url, e)
+        return None
+
+
+def host_closed_for(urls):
+    """Seconds until the circuits of all hosts of the URLs are closed again"""
+    try:
+        reopen_times = cache.get_many([_open_key(_host(url)) for url in urls])
+    except Exception as e:
+        logger.warning("Negative cache lookup failed for hosts, error: %s", e)
+        return 0
+    return max(
+        [0] + [math.ceil(until - time.time()) for until in reopen_times.values()]
+    )
+
+
+def record_url_failure(url, reason):
+    try:
+        cache.set(_url_key(url), reason, settings.NEGATIVE_CACHE_URL_TTL)
+    except Exception as e:
+        logger.warning("Failed to cache failure of URL: %s, error: %s", url, e)
+
+
+def record_host_failure(url):
+    host = _host(url)
+    key = f"negative:host:{host}:failures"
+    try:
+        cache.add(key, 0, settings.HOST_CIRCUIT_TTL)
+        if cache.incr(key) >= settings.HOST_FAILURE_THRESHOLD:
+            cache.set(
+                _open_key(host),
+                time.time() + settings.HOST_CIRCUIT_TTL,
+                settings.HOST_CIRCUIT_TTL,
+            )
+            cache.delete(key)
+            logger.warning("Opened circuit for host: %s", host)
+    except Exception as e:
+        logger.warning("Failed to record failure of host: %s, error: %s", host, e)
+
+
+def record_host_success(url):
+    try:
+        cache.delete(f"negative:host:{_host(url)}:failures")
+    except Exception as e:
+        logger.warning("Failed to reset failures of URL: %s, error: %s", url, e)
@@ -0,0 +1,104 @@
+"""
+Output profiles describe the variants generated for every image of a job,
+e.g. a thumbnail, a medium size and the compressed full-size image. All
+variants are rendered from a single download and decode of the source.
+"""
+
+import re
+from io import BytesIO
+
+OUTPUT_FORMATS = ["JPEG", "PNG", "WEBP"]
+MAX_OUTPUT_PROFILES = 10
+PROFILE_FIELDS = {"name", "max_width", "max_height", "format", "quality"}
+PROFILE_NAME_RE = re.compile(r"^[a-z0-9_-]{1,32}$")
+# Modes each format can store; others are converted before saving. Pillow's
+# WebP encoder converts by itself.
+FORMAT_MODES = {
+    "JPEG": {"RGB", "L", "CMYK"},
+    "PNG": {"1", "L", "LA", "P", "RGB", "RGBA", "I", "I;16"},
+}
+
+
+def _is_int(value):
+    # bool is a subclass of int, but true isn't a quality or a size
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def default_output_profiles():
+    # Compress image (reduce quality by 50%)
+    return [{"name": "compressed", "quality": 50}]
+
+
+def parse_output_profiles(profiles):
+    """Validate output profiles, raising ValueError on invalid ones"""
+    if not isinstance(profiles, list) or not profiles:
+        raise ValueError("Output profiles must be a non-empty list")
+    if len(profiles) > MAX_OUTPUT_PROFILES:
+        raise ValueError(f"At most {MAX_OUTPUT_PROFILES} output profiles are allowed")
+
+    parsed = []
+    names = set()
+    for profile in profiles:
+        if not isinstance(profile, dict):
+            raise ValueError("Each output profile must be an object")
+        unknown = set(profile) - PROFILE_FIELDS
+        if unknown:
+            raise ValueError(f"Unknown output profile fields: {sorted(unknown)}")
+
+        name = profile.get("name")
+        if not isinstance(name, str) or not PROFILE_NAME_RE.match(name):
+            raise ValueError(
+                "Output profile names must be 1-32 lowercase letters, digits, '_' or '-'"
+            )
+        if name in names:
+            raise ValueError(f"Duplicate output profile name: {name}")
+        names.add(name)
+
+        result = {"name": name, "quality": profile.get("quality", 50)}
+        if not _is_int(result["quality"]) or not 1 <= result["quality"] <= 95:
+            raise ValueError("Output profile quality must be between 1 and 95")
+        for key in ("max_width", "max_height"):
+            if key in profile:
+                if not _is_int(profile[key]) or profile[key] < 1:
+                    raise ValueError(f"Output profile {key} must be a positive integer")
+                result[key] = profile[key]
+        if "format" in profile:
+            image_format = str(profile["format"]).upper()
+            if image_format not in OUTPUT_FORMATS:
+                raise ValueError(
+                    f"Output profile format must be one of {OUTPUT_FORMATS}"
+                )
+            result["format"] = image_format
+        parsed.append(result)
+
+    return parsed
+
+
+def render_variant(pil_image, profile):
+    """Encode a decoded image according to a profile"""
+    # Imported here so that loading the models doesn't import Pillow
+    from PIL import Image as PILImage
+
+    image_format = profile.get("format") or pil_image.format
+    variant = pil_image
+    width, height = pil_image.size
+    scale = min(
+        profile.get("max_width", width) / width,
+        profile.get("max_height", height) / height,
+    )
+    if scale < 1:
+        # Resize straight from the source rather than a full size copy
+        variant = pil_image.resize(
+            (max(1, round(width * scale)), max(1, round(height * scale))),
+            PILImage.LANCZOS,
+            reducing_gap=3.0,
+        )
+    modes = FORMAT_MODES.get(image_format)
+    if modes and variant.mode not in modes:
+        keep_alpha = "RGBA" in modes and variant.has_transparency_data
+        variant = variant.convert("RGBA" if keep_alpha else "RGB")
+
+    output_buffer = BytesIO()
+    variant.save(output_buffer, format=image_format, quality=profile["quality"])
+    output_buffer.seek(0)
+    return output_buffer
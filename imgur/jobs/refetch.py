@@ -0,0 +1,66 @@
+"""
+Conditional re-fetch of input images.
+
+The ETag and Last-Modified of every downloaded image are stored with the
+variants produced from it. When the same URL is processed again with the same
+output profiles, it is requested with If-None-Match/If-Modified-Since and a
+304 response reuses the stored variants without downloading or uploading.
+"""
+
+import hashlib
+import json
+
+from django.utils import timezone
+
+from imgur.jobs.models import SourceImage
+
+
+def _hash(value):
+    return hashlib.sha1(value.encode()).hexdigest()
+
+
+def profiles_hash(profiles):
+    return _hash(json.dumps(profiles, sort_keys=True))
+
+
+def lookup(url, profiles):
+    """Stored fetch of the URL with these profiles, or None"""
+    return SourceImage.objects.filter(
+        url_hash=_hash(url), profiles_hash=profiles_hash(profiles)
+    ).first()
+
+
+def conditional_headers(source):
+    if source is None or not source.variants:
+        return {}
+    headers = {}
+    if source.etag:
+        headers["If-None-Match"] = source.etag
+    if source.last_modified:
+        headers["If-Modified-Since"] = source.last_modified
+    return headers
+
+
+def remember(url, profiles, response, output_url, variants):
+    """Store the validators of a downloaded image with its variants"""
+    etag = response.headers.get("ETag", "")
+    last_modified = response.headers.get("Last-Modified", "")
+    if not etag and not last_modified:
+        # The origin can't answer conditional requests, nothing to reuse
+        return
+    SourceImage.objects.update_or_create(
+        url_hash=_hash(url),
+        profiles_hash=profiles_hash(profiles),
+        defaults={
+            "input_url": url,
+            "etag": etag[:255],
+            "last_modified": last_modified[:64],
+            "content_length": len(response.content),
+            "output_url": output_url,
+            "variants": variants,
+        },
+    )
+
+
+def touch(source):
+    SourceImage.objects.filter(id=source.id).update(updated_at=timezone.now())
@@ -0,0 +1,277 @@
+"""
+Archival and purging of finished jobs and old Celery task results, and the
+partitions of the Image table.
+
+IDs are ULIDs, so they sort by creation time and "created before" is a range
+scan on the primary key index. Old rows are removed in fixed size batches to
+keep transactions short and the tables bounded.
+
+On PostgreSQL the Image table is partitioned by RANGE (id), one partition per
+calendar month (UTC). Partitions are created PARTITION_MONTHS_AHEAD months in
+advance and dropped once they are older than the job retention period and
+archival emptied them, which returns their space at once instead of leaving
+it to vacuum.
+"""
+
+import gzip
+import json
+import logging
+import os
+import re
+import uuid
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django_celery_results.models import TaskResult
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DatabaseError, connection
+from django.utils import timezone
+
+from imgur.jobs.models import ProcessingJob, Image, SourceImage
+
+logger = logging.getLogger(__name__)
+
+ARCHIVABLE_STATUSES = [ProcessingJob.STATUS_COMPLETED, ProcessingJob.STATUS_CANCELLED]
+PARTITION_MONTHS_AHEAD = 2
+PARTITION_UPPER_BOUND_RE = re.compile(r"TO \('([0-9a-f-]{36})'\)")
+
+
+def ulid_floor(moment):
+    """Smallest ULID generated at or after the given time"""
+    milliseconds = int(moment.timestamp() * 1000)
+    return uuid.UUID(bytes=milliseconds.to_bytes(6, "big") + bytes(10))
+
+
+def _write_archive(archive_dir, jobs, batch_size):
+    """
+    Write jobs to a gzipped JSON lines file: a {"job": ...} line per job,
+    followed by an {"image": ...} line per image of the job. Images are
+    streamed, so memory doesn't grow with the size of the jobs.
+    """
+    os.makedirs(archive_dir, exist_ok=True)
+    name = f"jobs-{jobs[0]['id']}-{jobs[-1]['id']}.jsonl.gz"
+    path = os.path.join(archive_dir, name)
+
+    # Write to a temporary file first so that a crash never leaves a partial archive
+    with gzip.open(path + ".tmp", "wt", encoding="utf-8") as f:
+        for job in jobs:
+            f.write(json.dumps({"job": job}, cls=DjangoJSONEncoder) + "\n")
+            images = (
+                Image.objects.filter(job_id=job["id"])
+                .order_by("id")
+                .values()
+                .iterator(chunk_size=batch_size)
+            )
+            for image in images:
+                f.write(json.dumps({"image": image}, cls=DjangoJSONEncoder) + "\n")
+    os.replace(path + ".tmp", path)
+    return path
+
+
+def _delete_images(job_ids, batch_size):
+    """Delete the images of jobs in batches of batch_size rows, in id order"""
+    images = Image.objects.filter(job_id__in=job_ids).order_by("id")
+    deleted = 0
+    last_id = None
+    while True:
+        batch = images.filter(id__gt=last_id) if last_id else images
+        ids = list(batch.values_list("id", flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        last_id = ids[-1]
+        deleted += Image.objects.filter(id__in=ids).delete()[0]
+
+
+def archive_jobs(older_than_days, archive_dir, batch_size, dry_run=False):
+    """
+    Archive finished jobs created more than older_than_days ago and delete
+    them with their images. Returns the number of archived jobs.
+    """
+    if not archive_dir and not dry_run:
+        raise ImproperlyConfigured("No archive directory to archive jobs to")
+
+    cutoff = ulid_floor(timezone.now() - timedelta(days=older_than_days))
+    jobs = ProcessingJob.objects.filter(
+        id__lt=cutoff, status__in=ARCHIVABLE_STATUSES
+    ).order_by("id")
+
+    archived = 0
+    last_id = None
+    while True:
+        batch = jobs.filter(id__gt=last_id) if last_id else jobs
+        batch = list(batch.values()[:batch_size])
+        if not batch:
+            break
+        last_id = batch[-1]["id"]
+
+        if dry_run:
+            archived += len(batch)
+            continue
+
+        path = _write_archive(archive_dir, batch, batch_size)
+        job_ids = [job["id"] for job in batch]
+        # Images first, in short transactions of batch_size rows each, so
+        # that deleting the jobs doesn't cascade to millions of rows at once
+        images = _delete_images(job_ids, batch_size)
+        ProcessingJob.objects.filter(id__in=job_ids).delete()
+        archived += len(batch)
+        logger.info("Archived %d jobs and %d images to %s", len(batch), images, path)
+
+    return archived
+
+
+def prune_task_results(older_than_days, batch_size):
+    """Delete stored Celery task results older than older_than_days"""
+    cutoff = timezone.now() - timedelta(days=older_than_days)
+    pruned = 0
+    while True:
+        ids = list(
+            TaskResult.objects.filter(date_done__lt=cutoff).values_list(
+                "id", flat=True
+            )[:batch_size]
+        )
+        if not ids:
+            break
+        pruned += TaskResult.objects.filter(id__in=ids).delete()[0]
+
+    if pruned:
+        logger.info("Pruned %d Celery task results", pruned)
+    return pruned
+
+
+def prune_source_images(older_than_days, batch_size):
+    """Forget stored fetches of input URLs not seen for older_than_days"""
+    cutoff = timezone.now() - timedelta(days=older_than_days)
+    pruned = 0
+    while True:
+        ids = list(
+            SourceImage.objects.filter(updated_at__lt=cutoff).values_list(
+                "id", flat=True
+            )[:batch_size]
+        )
+        if not ids:
+            break
+        pruned += SourceImage.objects.filter(id__in=ids).delete()[0]
+
+    if pruned:
+        logger.info("Pruned %d stored source image fetches", pruned)
+    return pruned
+
+
+def _month_start(moment, months=0):
+    """Start of the month the given number of months after moment's, in UTC"""
+    month = moment.year * 12 + moment.month - 1 + months
+    return datetime(month // 12, month % 12 + 1, 1, tzinfo=dt_timezone.utc)
+
+
+def image_partitions():
+    """
+    (name, upper bound) of the partitions of the Image table, with None as the
+    bound of the default partition; empty unless the table is partitioned
+    """
+    if connection.vendor != "postgresql":
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid WHERE i.inhparent = %s::regclass",
+            [Image._meta.db_table],
+        )
+        rows = cursor.fetchall()
+
+    partitions = []
+    for name, bound in rows:
+        match = PARTITION_UPPER_BOUND_RE.search(bound)
+        partitions.append((name, uuid.UUID(match.group(1)) if match else None))
+    return partitions
+
+
+def create_image_partitions(months_ahead=PARTITION_MONTHS_AHEAD):
+    """Create the monthly partitions of the next months_ahead months"""
+    partitions = image_partitions()
+    if not partitions:
+        return 0
+
+    existing = {name for name, _ in partitions}
+    now = timezone.now()
+    created = 0
+    # The current month always has a partition, created a month in advance or
+    # the one the existing rows were kept in
+    for months in range(1, months_ahead + 1):
+        start = _month_start(now, months)
+        name = f"{Image._meta.db_table}_p{start:%Y%m}"
+        if name in existing:
+            continue
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"CREATE TABLE {connection.ops.quote_name(name)} PARTITION OF "
+                    f"{connection.ops.quote_name(Image._meta.db_table)} "
+                    "FOR VALUES FROM (%s) TO (%s)",
+                    [
+                        str(ulid_floor(start)),
+                        str(ulid_floor(_month_start(now, months + 1))),
+                    ],
+                )
+        except DatabaseError as e:
+            # E.g. the default partition already holds rows of the month
+            logger.error("Failed to create image partition: %s, error: %s", name, e)
+            continue
+        created += 1
+        logger.info("Created image partition %s", name)
+    return created
+
+
+def drop_image_partitions(older_than_days):
+    """
+    Drop the partitions of the Image table entirely older than
+    older_than_days that hold no rows any more. Images of jobs that weren't
+    archived keep their partition.
+    """
+    cutoff = ulid_floor(timezone.now() - timedelta(days=older_than_days))
+    dropped = 0
+    for name, upper_bound in image_partitions():
+        if upper_bound is None or upper_bound > cutoff:
+            continue
+        table = connection.ops.quote_name(name)
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT EXISTS (SELECT 1 FROM {table})")
+            if cursor.fetchone()[0]:
+                continue
+            cursor.execute(f"DROP TABLE {table}")
+        dropped += 1
+        logger.info("Dropped empty image partition %s", name)
+    return dropped
+
+
+def apply_retention(dry_run=False):
+    archived = 0
+    if settings.RETENTION_ARCHIVE_DIR or dry_run:
+        archived = archive_jobs(
+            settings.RETENTION_JOB_DAYS,
+            settings.RETENTION_ARCHIVE_DIR,
+            settings.RETENTION_BATCH_SIZE,
+            dry_run=dry_run,
+        )
+    else:
+        logger.error("Not archiving jobs, RETENTION_ARCHIVE_DIR is not set")
+
+    pruned = sources = created = dropped = 0
+    if not dry_run:
+        pruned = prune_task_results(
+            settings.RETENTION_RESULT_DAYS, settings.RETENTION_BATCH_SIZE
+        )
+        sources = prune_source_images(
+            settings.RETENTION_JOB_DAYS, settings.RETENTION_BATCH_SIZE
+        )
+        created = create_image_partitions()
+        dropped = drop_image_partitions(settings.RETENTION_JOB_DAYS)
+    return {
+        "archived_jobs": archived,
+        "pruned_results": pruned,
+        "pruned_source_images": sources,
+        "created_partitions": created,
+        "dropped_partitions": dropped,
+    }
@@ -1,44 +1,190 @@
+import contextvars
 import logging
 import requests
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import timedelta
 from io import BytesIO
 
-from celery import shared_task
+from celery import group, shared_task
 from celery.exceptions import MaxRetriesExceededError
-import cloudinary.uploader
-from PIL import Image as PILImage
 
+from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
-from django.db import transaction
+from django.db import connection, transaction
+from django.db.models import F, PositiveIntegerField, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
 
+from imgur.jobs import memory, metrics, negative_cache, refetch, retention, tracing
 from imgur.jobs.models import ProcessingJob, Image
+from imgur.jobs.profiles import render_variant
+from imgur.jobs.storage import upload_image
 
 logger = logging.getLogger(__name__)
 
+# Download errors that retrying won't fix
+PERMANENT_HTTP_ERRORS = {400, 401, 403, 404, 410, 414, 415, 451}
 
+
+class PermanentImageError(Exception):
+    """The image can't be processed and retrying won't help"""
+
+
+@contextmanager
+def pipeline_stage(stage):
+    with tracing.span(f"image.{stage}"), metrics.time_stage(stage):
+        yield
+
+
+@metrics.IMAGES_IN_FLIGHT.track_inprogress()
 def process_single_image(img):
+    """
+    Process one image. Returns False if it failed and should be retried;
+    images that can never succeed are marked as failed instead.
+    """
+    with tracing.span("image.process", image_id=str(img.id), url=img.input_url):
+        return _process_single_image(img)
+
+
+def download_image(url, headers=None):
+    """
+    Download an image, consulting and feeding the negative cache. Returns the
+    response, which is a 304 for conditional requests of unchanged images.
+    """
+    reason = negative_cache.known_failure(url)
+    if reason:
+        raise PermanentImageError(reason)
+    if negative_cache.host_closed_for([url]):
+        # Leaves the image pending, the chunk is retried once the circuit closes
+        raise requests.ConnectionError(f"Host of {url} is unavailable")
+
     try:
-        # Download the image
-        response = requests.get(img.input_url)
-        if response.status_code != 200:
-            logger.error("Failed to download image from URL: %s", img.input_url)
-            return False
+        response = requests.get(
+            url,
+            headers=headers,
+            timeout=(settings.DOWNLOAD_CONNECT_TIMEOUT, settings.DOWNLOAD_READ_TIMEOUT),
+        )
+    except requests.ConnectionError:
+        negative_cache.record_host_failure(url)
+        raise
+    negative_cache.record_host_success(url)
 
-        # Open and compress the image
-        image_data = BytesIO(response.content)
-        pil_image = PILImage.open(image_data)
-        output_buffer = BytesIO()
+    if response.status_code in PERMANENT_HTTP_ERRORS:
+        reason = f"Download failed with HTTP {response.status_code}"
+        negative_cache.record_url_failure(url, reason)
+        raise PermanentImageError(reason)
+    if response.status_code == 304 and headers:
+        return response
+    if response.status_code != 200:
+        raise requests.HTTPError(f"Download failed with HTTP {response.status_code}")
+    return response
 
-        # Compress image (reduce quality by 50%)
-        pil_image.save(output_buffer, format=pil_image.format, quality=50)
-        output_buffer.seek(0)
 
-        # Upload to Cloudinary
-        cloudinary_response = cloudinary.uploader.upload(output_buffer)
-        img.output_url = cloudinary_response["secure_url"]
+def mark_failed(img, reason):
+    img.status = Image.STATUS_FAILED
+    img.error = reason[:255]
+    img.save(update_fields=["status", "error", "updated_at"])
+
+
+def reuse_source_image(img, source):
+    """Copy the outputs of an unchanged image from its last fetch"""
+    with pipeline_stage("db_write"):
+        img.output_url = source.output_url
+        img.variants = source.variants
         img.status = Image.STATUS_PROCESSED
-        img.save(update_fields=["output_url", "status", "updated_at"])
+        img.save(update_fields=["output_url", "variants", "status", "updated_at"])
+        refetch.touch(source)
+
+    logger.info("Reused outputs of unchanged image for URL: %s", img.input_url)
+    metrics.IMAGES_PROCESSED.labels("not_modified").inc()
+    return True
+
+
+def invalid_image(img, error):
+    reason = f"Invalid image: {error}"
+    negative_cache.record_url_failure(img.input_url, reason)
+    return PermanentImageError(reason)
+
+
+def _process_single_image(img):
+    # Only workers need Pillow, keep it out of the web processes enqueuing jobs
+    from PIL import Image as PILImage
+
+    profiles = img.job.output_profiles
+    budget = memory.get_budget()
+    try:
+        # Backpressure: don't download more while decoded images fill the budget
+        with pipeline_stage("admit"):
+            budget.wait_for_headroom()
+
+        # Download the image, unless it didn't change since the last fetch
+        with pipeline_stage("download"):
+            source = refetch.lookup(img.input_url, profiles)
+            response = download_image(
+                img.input_url, refetch.conditional_headers(source)
+            )
+        if response.status_code == 304:
+            return reuse_source_image(img, source)
+        metrics.DOWNLOAD_BYTES.observe(len(response.content))
+
+        try:
+            # Only reads the header, the pixels are decoded by load()
+            pil_image = PILImage.open(BytesIO(response.content))
+        except (PILImage.UnidentifiedImageError, PILImage.DecompressionBombError) as e:
+            raise invalid_image(img, e)
+
+        # Decode once for all output profiles, once the decoded size fits the budget
+        decoded_size = memory.decoded_size(pil_image)
+        with pipeline_stage("admit"):
+            budget.acquire(decoded_size)
+        try:
+            with pipeline_stage("decode"):
+                try:
+                    pil_image.load()
+                except OSError as e:
+                    raise invalid_image(img, e)
+
+            outputs = []
+            for profile in profiles:
+                with pipeline_stage("encode"):
+                    try:
+                        outputs.append(
+                            (profile["name"], render_variant(pil_image, profile))
+                        )
+                    except (OSError, ValueError) as e:
+                        # Encoding is deterministic, retrying won't help. It
+                        # depends on the profile too, so the URL isn't cached
+                        raise PermanentImageError(
+                            f"Encoding {profile['name']} failed: {e}"
+                        )
+        finally:
+            pil_image.close()
+            budget.release(decoded_size)
+
+        variants = {}
+        for name, output_buffer in outputs:
+            # Upload to Cloudinary
+            with pipeline_stage("upload"):
+                variants[name] = upload_image(output_buffer)
+
+        with pipeline_stage("db_write"):
+            img.output_url = variants[profiles[0]["name"]]
+            img.variants = variants
+            img.status = Image.STATUS_PROCESSED
+            img.save(update_fields=["output_url", "variants", "status", "updated_at"])
+            refetch.remember(
+                img.input_url, profiles, response, img.output_url, variants
+            )
 
         logger.info("Processed and uploaded image for URL: %s", img.input_url)
+        metrics.IMAGES_PROCESSED.labels("processed").inc()
+        return True
+    except PermanentImageError as e:
+        logger.error("Rejected image for URL: %s, reason: %s", img.input_url, e)
+        mark_failed(img, str(e))
+        metrics.IMAGES_PROCESSED.labels("rejected").inc()
         return True
     except Exception as e:
         logger.error(
@@ -46,6 +192,7 @@ def process_single_image(img):
             img.input_url,
             str(e),
         )
+        metrics.IMAGES_PROCESSED.labels("failed").inc()
         return False
 
 
@@ -57,7 +204,7 @@ def trigger_webhook(job):
 
     # Prepare payload
     images = Image.objects.filter(job=job).values(
-        "product_name", "input_url", "output_url", "status"
+        "product_name", "input_url", "output_url", "variants", "status", "error"
     )
     payload = {
         "job_id": str(job.id),
@@ -75,61 +222,359 @@ def trigger_webhook(job):
         )
 
 
+def job_routing(job, image_count):
+    """Celery routing options for a job's tasks based on its size and priority"""
+    if image_count > settings.JOB_SMALL_MAX_IMAGES:
+        queue = settings.JOB_LARGE_QUEUE
+    else:
+        queue = settings.JOB_SMALL_QUEUE
+    return {
+        "queue": queue,
+        "priority": settings.JOB_CELERY_PRIORITIES[job.priority],
+    }
+
+
+def enqueue_job(job, image_count):
+    """Schedule processing of a freshly created job"""
+    routing = job_routing(job, image_count)
+    process_images.apply_async((job.id,), **routing)
+    logger.info(
+        "Queued job ID: %s on %s with priority %s",
+        job.id,
+        routing["queue"],
+        job.priority,
+    )
+
+
+def enqueue_jobs(jobs):
+    """Schedule many freshly created jobs with a single group dispatch"""
+    group(
+        process_images.signature((job.id,), **job_routing(job, job.total_images))
+        for job in jobs
+    ).apply_async()
+    logger.info("Queued %d jobs", len(jobs))
+
+
+def cancel_job(job_id):
+    """Stop a job for good; chunks already running finish their current chunk"""
+    return bool(
+        ProcessingJob.objects.filter(
+            id=job_id,
+            status__in=[
+                ProcessingJob.STATUS_PENDING,
+                ProcessingJob.STATUS_PROCESSING,
+                ProcessingJob.STATUS_PAUSED,
+            ],
+        ).update(status=ProcessingJob.STATUS_CANCELLED, updated_at=timezone.now())
+    )
+
+
+def pause_job(job_id):
+    return bool(
+        ProcessingJob.objects.filter(
+            id=job_id,
+            status__in=[ProcessingJob.STATUS_PENDING, ProcessingJob.STATUS_PROCESSING],
+        ).update(status=ProcessingJob.STATUS_PAUSED, updated_at=timezone.now())
+    )
+
+
+def resume_job(job_id):
+    """Queue a paused job again; only its pending images are processed"""
+    updated = ProcessingJob.objects.filter(
+        id=job_id, status=ProcessingJob.STATUS_PAUSED
+    ).update(status=ProcessingJob.STATUS_PENDING, updated_at=timezone.now())
+    if not updated:
+        return False
+
+    job = ProcessingJob.objects.get(id=job_id)
+    enqueue_job(job, job.total_images or job.images.count())
+    return True
+
+
+def _process_in_thread(work, results):
+    """Process images taken from the shared work queue until it is empty"""
+    try:
+        while True:
+            try:
+                index, img = work.popleft()
+            except IndexError:
+                return
+            results[index] = process_single_image(img)
+    finally:
+        # Threads don't go through Django's request cycle, close their
+        # connection once, after their last image
+        connection.close()
+
+
+def process_images_concurrently(images):
+    """Process images with WORKER_IMAGE_CONCURRENCY threads, returning results"""
+    concurrency = min(settings.WORKER_IMAGE_CONCURRENCY, len(images))
+    if concurrency <= 1:
+        return [process_single_image(img) for img in images]
+
+    work = deque(enumerate(images))
+    results = [False] * len(images)
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        # Each thread runs in a copy of the context, keeping the current trace
+        futures = [
+            executor.submit(
+                contextvars.copy_context().run, _process_in_thread, work, results
+            )
+            for _ in range(concurrency)
+        ]
+        for future in futures:
+            future.result()
+    return results
+
+
+def dispatch_next_chunk(job_id, generation):
+    """
+    Hand the next chunk of pending images of a job to a worker.
+
+    Returns False when there is nothing left to dispatch, or when the job was
+    dispatched again since generation.
+    """
+    with transaction.atomic():
+        job = ProcessingJob.objects.select_for_update().get(id=job_id)
+        if job.status != ProcessingJob.STATUS_PROCESSING:
+            logger.info(
+                "Not dispatching more chunks for %s job ID: %s", job.status, job_id
+            )
+            return False
+        if job.dispatch_generation != generation:
+            logger.info("Not dispatching superseded chunks of job ID: %s", job_id)
+            return False
+
+        images = Image.objects.filter(job=job, status=Image.STATUS_PENDING)
+        if job.chunk_cursor:
+            images = images.filter(id__gt=job.chunk_cursor)
+        image_ids = list(
+            images.order_by("id").values_list("id", flat=True)[
+                : settings.JOB_CHUNK_SIZE
+            ]
+        )
+        if not image_ids:
+            return False
+
+        job.chunk_cursor = image_ids[-1]
+        job.chunks_dispatched += 1
+        job.save_fields(["chunk_cursor", "chunks_dispatched"])
+
+    process_image_chunk.apply_async(
+        (
+            str(job.id),
+            [str(image_id) for image_id in image_ids],
+            generation,
+            job.chunks_dispatched,
+        ),
+        **job_routing(job, job.total_images),
+    )
+    logger.debug("Dispatched chunk of %d images for job ID: %s", len(image_ids), job_id)
+    return True
+
+
+def complete_job(job_id):
+    """Mark the job as completed once none of its images are pending"""
+    if Image.objects.filter(job_id=job_id, status=Image.STATUS_PENDING).exists():
+        return False
+
+    # Conditional update so that concurrently finishing chunks complete the job once
+    completed_at = timezone.now()
+    updated = ProcessingJob.objects.filter(
+        id=job_id, status=ProcessingJob.STATUS_PROCESSING
+    ).update(status=ProcessingJob.STATUS_COMPLETED, updated_at=completed_at)
+    if not updated:
+        return False
+
+    logger.info("Job status updated to COMPLETED for job ID: %s", job_id)
+    job = ProcessingJob.objects.get(id=job_id)
+    metrics.observe_job_completed(job, completed_at)
+    # Trigger webhook after job completion
+    trigger_webhook(job)
+    return True
+
+
 @shared_task(bind=True, max_retries=5)
 def process_images(self, job_id):
+    with tracing.task_span("job.dispatch", self, job_id=str(job_id)):
+        return _process_images(job_id)
+
+
+def _process_images(job_id):
     logger.info("Starting image processing for job ID: %s", job_id)
 
     try:
-        # Fetch job if status is PENDING or PROCESSING
-        job = ProcessingJob.objects.filter(
-            id=job_id,
-            status__in=[ProcessingJob.STATUS_PENDING, ProcessingJob.STATUS_PROCESSING],
-        ).first()
+        with transaction.atomic():
+            # Fetch job if status is PENDING or PROCESSING
+            job = (
+                ProcessingJob.objects.select_for_update()
+                .filter(
+                    id=job_id,
+                    status__in=[
+                        ProcessingJob.STATUS_PENDING,
+                        ProcessingJob.STATUS_PROCESSING,
+                    ],
+                )
+                .first()
+            )
 
-        if not job:
-            logger.error("Job not found or already completed for job ID: %s", job_id)
-            return {"error": "Job not found or already completed"}
+            if not job:
+                logger.error(
+                    "Job not found or already completed for job ID: %s", job_id
+                )
+                return {"error": "Job not found or already completed"}
 
-        # Only update to "PROCESSING" if it's still "PENDING"
-        if job.status == ProcessingJob.STATUS_PENDING:
-            with transaction.atomic():
-                job.status = ProcessingJob.STATUS_PROCESSING
-                job.save(update_fields=["status", "updated_at"])
-                logger.info("Job status updated to PROCESSING for job ID: %s", job_id)
+            # A new generation, so that chunks of an earlier dispatch still
+            # queued or waiting to retry exit instead of processing the images
+            # handed out again below
+            job.status = ProcessingJob.STATUS_PROCESSING
+            job.total_images = Image.objects.filter(job=job).count()
+            job.chunk_cursor = None
+            job.dispatch_generation += 1
+            job.save_fields(
+                ["status", "total_images", "chunk_cursor", "dispatch_generation"]
+            )
+            logger.info("Job status updated to PROCESSING for job ID: %s", job_id)
 
-        # Process only pending images
-        images = Image.objects.filter(job=job, status=Image.STATUS_PENDING)
+        # Keep a bounded number of chunks in flight; each finished chunk
+        # dispatches the next one, so jobs sharing a queue are interleaved.
+        window = settings.JOB_CHUNK_WINDOW * settings.JOB_PRIORITY_WEIGHTS[job.priority]
+        dispatched = 0
+        while dispatched < window and dispatch_next_chunk(
+            job.id, job.dispatch_generation
+        ):
+            dispatched += 1
 
-        for img in images:
-            try:
-                success = process_single_image(img)
-                if not success:
-                    raise Exception("Image processing failed")
-            except Exception:
-                try:
-                    self.retry(countdown=2**self.request.retries)
-                except MaxRetriesExceededError:
-                    logger.error(
-                        "Max retries exceeded for image URL: %s", img.input_url
-                    )
-
-        # Check if all images are processed
-        total_images = Image.objects.filter(job=job).count()
-        processed_images = Image.objects.filter(
-            job=job, status=Image.STATUS_PROCESSED
-        ).count()
-
-        if total_images == processed_images:
-            with transaction.atomic():
-                job.status = ProcessingJob.STATUS_COMPLETED
-                job.save(update_fields=["status", "updated_at"])
-                logger.info("Job status updated to COMPLETED for job ID: %s", job_id)
-
-            # Trigger webhook after job completion
-            trigger_webhook(job)
+        if not dispatched:
+            complete_job(job.id)
 
     except Exception as e:
         logger.error(
             "Error processing images for job ID: %s, error: %s", job_id, str(e)
         )
         return {"error": str(e)}
+
+
+@shared_task(bind=True, max_retries=5, ignore_result=True)
+def process_image_chunk(self, job_id, image_ids, generation=0, number=0):
+    with tracing.task_span(
+        "job.chunk",
+        self,
+        job_id=job_id,
+        images=len(image_ids),
+        retries=self.request.retries,
+    ):
+        _process_image_chunk(self, job_id, image_ids, generation, number)
+
+
+def next_chunk_number(job_id):
+    with transaction.atomic():
+        job = ProcessingJob.objects.select_for_update().get(id=job_id)
+        job.chunks_dispatched += 1
+        job.save(update_fields=["chunks_dispatched"])
+    return job.chunks_dispatched
+
+
+def _process_image_chunk(task, job_id, image_ids, generation, number):
+    # Paused and cancelled jobs stop between chunks, and chunks of a job that
+    # was dispatched again since are dropped; for running jobs this is also
+    # the heartbeat the stalled job sweeper looks at
+    if not ProcessingJob.objects.filter(
+        id=job_id,
+        status=ProcessingJob.STATUS_PROCESSING,
+        dispatch_generation=generation,
+    ).update(
+        updated_at=timezone.now(),
+        chunks_started=Greatest(
+            "chunks_started", Value(number, output_field=PositiveIntegerField())
+        ),
+    ):
+        logger.info(
+            "Skipping chunk of job ID: %s, job is not processing or the chunk "
+            "is superseded",
+            job_id,
+        )
+        return
+
+    images = list(
+        Image.objects.filter(
+            id__in=image_ids, status=Image.STATUS_PENDING
+        ).select_related("job")
+    )
+
+    with metrics.CHUNKS_IN_FLIGHT.track_inprogress():
+        results = process_images_concurrently(images)
+
+    if not all(results):
+        # Images of unavailable hosts wait until their circuit closes
+        pending_urls = [
+            img.input_url for img in images if img.status == Image.STATUS_PENDING
+        ]
+        countdown = max(
+            2**task.request.retries, negative_cache.host_closed_for(pending_urls)
+        )
+        try:
+            # Retry only re-processes the images of this chunk still pending.
+            # It waits like a freshly dispatched chunk, so it gets a new number.
+            raise task.retry(
+                args=(job_id, image_ids, generation, next_chunk_number(job_id)),
+                countdown=countdown,
+            )
+        except MaxRetriesExceededError:
+            logger.error(
+                "Max retries exceeded for chunk of job ID: %s, images: %s",
+                job_id,
+                image_ids,
+            )
+            Image.objects.filter(id__in=image_ids, status=Image.STATUS_PENDING).update(
+                status=Image.STATUS_FAILED,
+                error="Max retries exceeded",
+                updated_at=timezone.now(),
+            )
+
+    if not dispatch_next_chunk(job_id, generation):
+        complete_job(job_id)
+
+
+@shared_task
+def sweep_stalled_jobs():
+    """
+    Re-dispatch processing jobs that made no progress within JOB_STALL_TIMEOUT,
+    e.g. because the worker running them died. Only pending images are picked up.
+
+    Jobs with chunks still waiting in a queue aren't stalled: re-dispatching
+    them would drop those chunks and queue new ones behind everything else.
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.JOB_STALL_TIMEOUT)
+    stalled = ProcessingJob.objects.filter(
+        status=ProcessingJob.STATUS_PROCESSING,
+        updated_at__lt=cutoff,
+        chunks_started__gte=F("chunks_dispatched"),
+    )
+
+    swept = 0
+    for job in stalled:
+        # Claim the job so that overlapping sweeps don't dispatch it twice
+        claimed = ProcessingJob.objects.filter(
+            id=job.id, status=job.status, updated_at=job.updated_at
+        ).update(updated_at=timezone.now())
+        if not claimed:
+            continue
+
+        logger.warning(
+            "Re-dispatching stalled job ID: %s, last update at %s",
+            job.id,
+            job.updated_at,
+        )
+        enqueue_job(job, job.total_images or job.images.count())
+        swept += 1
+
+    return swept
+
+
+# Acknowledged on receipt: a long first run over a large backlog would outlast
+# the broker's visibility timeout and be redelivered to run a second time
+# alongside it
+@shared_task(ignore_result=True, acks_late=False)
+def archive_old_jobs():
+    logger.info("Applying retention: %s", retention.apply_retention())
@@ -0,0 +1,10 @@
+from imgur.jobs.models import ProcessingJob, Image
+
+
+def create_job(images=3, **kwargs):
+    job = ProcessingJob.objects.create(**kwargs)
+    for i in range(images):
+        Image.objects.create(
+            job=job, product_name="SKU1", input_url=f"https://example.com/{i}.jpg"
+        )
+    return job
@@ -0,0 +1,132 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from imgur.jobs import tasks
+from imgur.jobs.benchmarking import InlineBroker
+from imgur.jobs.models import ProcessingJob, Image
+from imgur.jobs.tests.helpers import create_job
+
+
+class JobControlTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.broker = InlineBroker()
+
+    def post(self, action, job_id):
+        with self.broker.capture():
+            return self.client.post(f"/api/{action}/{job_id}/")
+
+    def test_pause_and_resume(self):
+        job = create_job()
+
+        response = self.post("pause", job.id)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["status"], ProcessingJob.STATUS_PAUSED)
+
+        response = self.post("resume", job.id)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["status"], ProcessingJob.STATUS_PENDING)
+        self.assertEqual(self.broker.dispatched, 1)
+
+    def test_cancel_paused_job(self):
+        job = create_job(status=ProcessingJob.STATUS_PAUSED)
+
+        response = self.post("cancel", job.id)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["status"], ProcessingJob.STATUS_CANCELLED)
+
+    def test_invalid_transitions(self):
+        for status, action in [
+            (ProcessingJob.STATUS_PENDING, "resume"),
+            (ProcessingJob.STATUS_PAUSED, "pause"),
+            (ProcessingJob.STATUS_COMPLETED, "cancel"),
+            (ProcessingJob.STATUS_COMPLETED, "pause"),
+            (ProcessingJob.STATUS_CANCELLED, "resume"),
+            (ProcessingJob.STATUS_CANCELLED, "cancel"),
+        ]:
+            with self.subTest(status=status, action=action):
+                job = create_job(images=0, status=status)
+                response = self.post(action, job.id)
+                self.assertEqual(response.status_code, 400)
+                job.refresh_from_db()
+                self.assertEqual(job.status, status)
+        self.assertEqual(self.broker.dispatched, 0)
+
+    def test_unknown_job(self):
+        response = self.post("cancel", "00000000-0000-0000-0000-000000000000")
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(JOB_CHUNK_SIZE=1, JOB_CHUNK_WINDOW=1)
+    def test_resume_drops_chunks_of_earlier_dispatch(self):
+        job = create_job(priority=ProcessingJob.PRIORITY_LOW)
+        processed = []
+
+        def process(images):
+            processed.extend(img.id for img in images)
+            Image.objects.filter(id__in=[img.id for img in images]).update(
+                status=Image.STATUS_PROCESSED
+            )
+            return [True] * len(images)
+
+        with self.broker.capture(), mock.patch.object(
+            tasks, "process_images_concurrently", side_effect=process
+        ):
+            tasks.process_images.delay(job.id)
+            self.run_next()
+            # A chunk of the first dispatch is still queued while the job is
+            # paused and resumed
+            stale_chunk = self.broker.queue.popleft()
+            self.assertEqual(self.post("pause", job.id).status_code, 200)
+            self.assertEqual(self.post("resume", job.id).status_code, 200)
+            self.run_next()
+
+            task, args, kwargs, headers = stale_chunk
+            task.apply(args=args, kwargs=kwargs, headers=headers)
+            self.assertEqual(processed, [])
+
+            self.broker.run()
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, ProcessingJob.STATUS_COMPLETED)
+        self.assertEqual(job.dispatch_generation, 2)
+        self.assertCountEqual(processed, job.images.values_list("id", flat=True))
+
+    def run_next(self):
+        task, args, kwargs, headers = self.broker.queue.popleft()
+        task.apply(args=args, kwargs=kwargs, headers=headers)
+
+
+@override_settings(JOB_CHUNK_SIZE=1, JOB_CHUNK_WINDOW=1, JOB_STALL_TIMEOUT=60)
+class StalledJobSweepTests(TestCase):
+    def age(self, job):
+        ProcessingJob.objects.filter(id=job.id).update(
+            updated_at=timezone.now() - timedelta(minutes=5)
+        )
+
+    def test_keeps_jobs_with_queued_chunks(self):
+        job = create_job(priority=ProcessingJob.PRIORITY_LOW)
+        broker = InlineBroker()
+
+        with broker.capture():
+            tasks.process_images.delay(job.id)
+            broker.queue.popleft()[0].apply(args=(job.id,))
+            self.assertEqual(len(broker.queue), 1)
+
+            # The chunk waits in a busy queue
+            self.age(job)
+            self.assertEqual(tasks.sweep_stalled_jobs(), 0)
+
+            # The worker running it dies
+            with mock.patch.object(
+                tasks, "process_images_concurrently", side_effect=SystemError
+            ):
+                task, args, kwargs, headers = broker.queue.popleft()
+                task.apply(args=args, kwargs=kwargs, headers=headers, throw=False)
+            self.age(job)
+            self.assertEqual(tasks.sweep_stalled_jobs(), 1)
+
+        self.assertEqual([task for task, *_ in broker.queue], [tasks.process_images])
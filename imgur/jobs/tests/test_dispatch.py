@@ -0,0 +1,66 @@
+from unittest import mock
+
+from django.test import TestCase, override_settings
+
+from imgur.jobs import tasks
+from imgur.jobs.models import ProcessingJob
+from imgur.jobs.tests.helpers import create_job
+
+
+@override_settings(JOB_SMALL_MAX_IMAGES=5)
+class JobRoutingTests(TestCase):
+    def test_queue_by_size(self):
+        job = ProcessingJob(priority=ProcessingJob.PRIORITY_NORMAL)
+        self.assertEqual(tasks.job_routing(job, 5)["queue"], "small_jobs")
+        self.assertEqual(tasks.job_routing(job, 6)["queue"], "large_jobs")
+
+    def test_celery_priority(self):
+        for priority, celery_priority in [
+            (ProcessingJob.PRIORITY_HIGH, 0),
+            (ProcessingJob.PRIORITY_NORMAL, 3),
+            (ProcessingJob.PRIORITY_LOW, 6),
+        ]:
+            with self.subTest(priority=priority):
+                job = ProcessingJob(priority=priority)
+                self.assertEqual(tasks.job_routing(job, 1)["priority"], celery_priority)
+
+    def test_chunks_follow_their_job(self):
+        job = create_job(images=6, priority=ProcessingJob.PRIORITY_HIGH)
+
+        with mock.patch.object(tasks.process_image_chunk, "apply_async") as dispatch:
+            tasks._process_images(job.id)
+
+        self.assertTrue(dispatch.called)
+        for call in dispatch.call_args_list:
+            self.assertEqual(call.kwargs, {"queue": "large_jobs", "priority": 0})
+
+
+@override_settings(JOB_CHUNK_SIZE=2, JOB_CHUNK_WINDOW=1)
+class ChunkWindowTests(TestCase):
+    def dispatched_chunks(self, job):
+        with mock.patch.object(tasks.process_image_chunk, "apply_async") as dispatch:
+            tasks._process_images(job.id)
+        return [call.args[0][1] for call in dispatch.call_args_list]
+
+    def test_window_is_weighted_by_priority(self):
+        for priority, chunks in [
+            (ProcessingJob.PRIORITY_LOW, 1),
+            (ProcessingJob.PRIORITY_NORMAL, 2),
+            (ProcessingJob.PRIORITY_HIGH, 4),
+        ]:
+            with self.subTest(priority=priority):
+                job = create_job(images=20, priority=priority)
+                self.assertEqual(len(self.dispatched_chunks(job)), chunks)
+
+    def test_window_stops_at_the_last_image(self):
+        job = create_job(images=3, priority=ProcessingJob.PRIORITY_HIGH)
+
+        chunks = self.dispatched_chunks(job)
+
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 1])
+        self.assertCountEqual(
+            [image_id for chunk in chunks for image_id in chunk],
+            [str(image_id) for image_id in job.images.values_list("id", flat=True)],
+        )
+        job.refresh_from_db()
+        self.assertEqual(job.status, ProcessingJob.STATUS_PROCESSING)
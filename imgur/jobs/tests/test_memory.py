@@ -0,0 +1,28 @@
+import threading
+
+from django.test import SimpleTestCase
+
+from imgur.jobs.memory import MemoryBudget
+
+
+class MemoryBudgetTests(SimpleTestCase):
+    def test_admits_image_larger_than_budget_alone(self):
+        budget = MemoryBudget(100)
+        budget.acquire(500)
+        self.assertEqual(budget.reserved, 500)
+
+        waiter = threading.Thread(target=budget.acquire, args=(10,))
+        waiter.start()
+        waiter.join(0.1)
+        self.assertTrue(waiter.is_alive())
+
+        budget.release(500)
+        waiter.join(1)
+        self.assertFalse(waiter.is_alive())
+        self.assertEqual(budget.reserved, 10)
+
+    def test_unlimited(self):
+        budget = MemoryBudget(0)
+        budget.acquire(500)
+        budget.wait_for_headroom()
+        self.assertEqual(budget.reserved, 0)
@@ -0,0 +1,60 @@
+import os
+from types import SimpleNamespace
+from unittest import mock
+
+from kombu.exceptions import ChannelError
+
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from imgur.celery import app, start_metrics_server
+from imgur.jobs import metrics
+from imgur.jobs.metrics import PipelineCollector
+
+
+class StubChannel:
+    """Channel of a Redis broker, on which empty queues don't exist"""
+
+    def __init__(self, sizes):
+        self.sizes = sizes
+
+    def queue_declare(self, queue, passive=False):
+        if not self.sizes.get(queue):
+            raise ChannelError(f"NOT_FOUND - no queue {queue!r} in vhost '/'")
+        return SimpleNamespace(queue=queue, message_count=self.sizes[queue])
+
+
+class PipelineCollectorTests(TestCase):
+    def collect(self, sizes):
+        conn = mock.MagicMock()
+        conn.__enter__.return_value = conn
+        conn.default_channel = StubChannel(sizes)
+        with mock.patch.object(app, "connection_for_read", return_value=conn):
+            families = {family.name: family for family in PipelineCollector().collect()}
+        return {
+            sample.labels["queue"]: sample.value
+            for sample in families["imgur_queue_depth"].samples
+        }
+
+    def test_queue_depth_of_empty_queues(self):
+        self.assertEqual(
+            self.collect({"large_jobs": 7}),
+            {"celery": 0, "small_jobs": 0, "large_jobs": 7},
+        )
+
+
+@override_settings(METRICS_WORKER_PORT=9100)
+class WorkerMetricsServerTests(SimpleTestCase):
+    def start(self, pool, multiproc_dir=None):
+        with mock.patch.dict(os.environ), mock.patch.object(
+            metrics, "start_http_server"
+        ) as start_http_server:
+            os.environ.pop("PROMETHEUS_MULTIPROC_DIR", None)
+            if multiproc_dir:
+                os.environ["PROMETHEUS_MULTIPROC_DIR"] = multiproc_dir
+            start_metrics_server(SimpleNamespace(pool_cls=pool))
+        return start_http_server.called
+
+    def test_prefork_needs_multiprocess_dir(self):
+        self.assertFalse(self.start("prefork"))
+        self.assertTrue(self.start("prefork", "/tmp"))
+        self.assertTrue(self.start("threads"))
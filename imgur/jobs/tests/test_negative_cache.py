@@ -0,0 +1,59 @@
+import time
+from unittest import mock
+
+import requests
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from imgur.jobs import negative_cache, tasks
+
+
+@override_settings(
+    NEGATIVE_CACHE_URL_TTL=60, HOST_FAILURE_THRESHOLD=3, HOST_CIRCUIT_TTL=300
+)
+class NegativeCacheTests(SimpleTestCase):
+    url = "https://example.com/missing.jpg"
+
+    def setUp(self):
+        cache.clear()
+
+    def test_url_failure_expires(self):
+        negative_cache.record_url_failure(self.url, "Download failed with HTTP 404")
+        self.assertEqual(
+            negative_cache.known_failure(self.url), "Download failed with HTTP 404"
+        )
+        self.assertIsNone(negative_cache.known_failure("https://example.com/a.jpg"))
+
+        with mock.patch("time.time", return_value=time.time() + 61):
+            self.assertIsNone(negative_cache.known_failure(self.url))
+
+    def test_circuit_opens_at_threshold(self):
+        for _ in range(2):
+            negative_cache.record_host_failure(self.url)
+        self.assertEqual(negative_cache.host_closed_for([self.url]), 0)
+
+        negative_cache.record_host_failure(self.url)
+        self.assertEqual(negative_cache.host_closed_for([self.url]), 300)
+        self.assertEqual(
+            negative_cache.host_closed_for(["https://other.example.com/a.jpg"]), 0
+        )
+
+        with mock.patch("time.time", return_value=time.time() + 301):
+            self.assertEqual(negative_cache.host_closed_for([self.url]), 0)
+
+    def test_success_resets_failures(self):
+        for _ in range(2):
+            negative_cache.record_host_failure(self.url)
+        negative_cache.record_host_success(self.url)
+        negative_cache.record_host_failure(self.url)
+        self.assertEqual(negative_cache.host_closed_for([self.url]), 0)
+
+    def test_open_circuit_skips_download(self):
+        for _ in range(3):
+            negative_cache.record_host_failure(self.url)
+
+        with mock.patch.object(requests, "get") as get:
+            with self.assertRaises(requests.ConnectionError):
+                tasks.download_image(self.url)
+        get.assert_not_called()
@@ -0,0 +1,140 @@
+from io import BytesIO
+from unittest import mock
+
+import requests
+from PIL import Image as PILImage
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from imgur.jobs import negative_cache, tasks
+from imgur.jobs.models import ProcessingJob, Image, SourceImage
+from imgur.jobs.tasks import process_single_image
+
+URL = "https://example.com/banner.png"
+
+
+def encoded(size, image_format="PNG"):
+    buffer = BytesIO()
+    PILImage.new("RGB", size).save(buffer, format=image_format)
+    return buffer.getvalue()
+
+
+def response(status_code=200, content=b"", headers=None):
+    result = requests.Response()
+    result.status_code = status_code
+    result._content = content
+    result.headers.update(headers or {})
+    return result
+
+
+@override_settings(IMAGE_STORAGE_BACKEND="imgur.jobs.storage.StubStorage")
+class ProcessImageTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def create_image(self, profiles, url=URL):
+        job = ProcessingJob.objects.create(output_profiles=profiles)
+        return Image.objects.create(job=job, product_name="SKU1", input_url=url)
+
+    def process(self, img, download):
+        with mock.patch.object(requests, "get", return_value=download) as get:
+            self.assertTrue(process_single_image(img))
+        img.refresh_from_db()
+        return get
+
+    def test_encode_failure_is_not_cached_for_the_url(self):
+        # Wider than WebP allows, fine as JPEG
+        download = response(content=encoded((17000, 20)))
+
+        img = self.create_image([{"name": "full", "format": "WEBP", "quality": 50}])
+        self.process(img, download)
+        self.assertEqual(img.status, Image.STATUS_FAILED)
+        self.assertIn("Encoding full failed", img.error)
+        self.assertIsNone(negative_cache.known_failure(URL))
+
+        img = self.create_image([{"name": "full", "format": "JPEG", "quality": 50}])
+        get = self.process(img, download)
+        get.assert_called_once()
+        self.assertEqual(img.status, Image.STATUS_PROCESSED)
+
+    def test_decode_failure_is_cached_for_the_url(self):
+        img = self.create_image([{"name": "full", "quality": 50}])
+        self.process(img, response(content=b"not an image"))
+        self.assertEqual(img.status, Image.STATUS_FAILED)
+        self.assertTrue(negative_cache.known_failure(URL))
+
+        img = self.create_image([{"name": "full", "quality": 50}])
+        get = self.process(img, response(content=encoded((40, 30))))
+        get.assert_not_called()
+        self.assertEqual(img.status, Image.STATUS_FAILED)
+
+    def test_unchanged_image_reuses_stored_variants(self):
+        profiles = [{"name": "full", "quality": 50}]
+        validators = {"ETag": '"v1"', "Last-Modified": "Mon, 19 Oct 2026 10:00:00 GMT"}
+        first = self.create_image(profiles)
+        self.process(first, response(content=encoded((40, 30)), headers=validators))
+        source = SourceImage.objects.get(input_url=URL)
+        self.assertEqual(source.etag, '"v1"')
+        self.assertEqual(source.variants, first.variants)
+
+        img = self.create_image(profiles)
+        with mock.patch.object(tasks, "upload_image") as upload_image:
+            get = self.process(img, response(status_code=304))
+
+        self.assertEqual(
+            get.call_args.kwargs["headers"],
+            {
+                "If-None-Match": '"v1"',
+                "If-Modified-Since": "Mon, 19 Oct 2026 10:00:00 GMT",
+            },
+        )
+        upload_image.assert_not_called()
+        self.assertEqual(img.status, Image.STATUS_PROCESSED)
+        self.assertEqual(img.output_url, first.output_url)
+        self.assertEqual(img.variants, first.variants)
+
+    def test_refetch_needs_validators_and_the_same_profiles(self):
+        self.process(
+            self.create_image([{"name": "full", "quality": 50}]),
+            response(content=encoded((40, 30))),
+        )
+        self.assertFalse(SourceImage.objects.exists())
+
+        self.process(
+            self.create_image([{"name": "full", "quality": 50}]),
+            response(content=encoded((40, 30)), headers={"ETag": '"v1"'}),
+        )
+        other = "https://example.com/logo.png"
+        self.process(
+            self.create_image([{"name": "full", "quality": 50}], url=other),
+            response(
+                content=encoded((40, 30)),
+                headers={"Last-Modified": "Mon, 19 Oct 2026 10:00:00 GMT"},
+            ),
+        )
+        self.assertEqual(
+            sorted(SourceImage.objects.values_list("input_url", flat=True)),
+            [URL, other],
+        )
+
+        get = self.process(
+            self.create_image([{"name": "full", "quality": 80}]),
+            response(content=encoded((40, 30))),
+        )
+        self.assertEqual(get.call_args.kwargs["headers"], {})
+
+
+class ConcurrentProcessingTests(SimpleTestCase):
+    @override_settings(WORKER_IMAGE_CONCURRENCY=4)
+    def test_threads_close_their_connection_once(self):
+        def process(img):
+            return img % 3 != 0
+
+        with mock.patch.object(
+            tasks, "process_single_image", side_effect=process
+        ), mock.patch.object(tasks, "connection") as connection:
+            results = tasks.process_images_concurrently(list(range(20)))
+
+        self.assertEqual(results, [i % 3 != 0 for i in range(20)])
+        self.assertEqual(connection.close.call_count, 4)
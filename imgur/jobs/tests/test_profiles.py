@@ -0,0 +1,72 @@
+from PIL import Image as PILImage
+
+from django.test import SimpleTestCase
+
+from imgur.jobs.profiles import parse_output_profiles, render_variant
+
+
+class OutputProfilesTests(SimpleTestCase):
+    def test_defaults_and_normalization(self):
+        self.assertEqual(
+            parse_output_profiles(
+                [{"name": "thumb", "max_width": 200, "format": "webp"}]
+            ),
+            [{"name": "thumb", "quality": 50, "max_width": 200, "format": "WEBP"}],
+        )
+
+    def test_rejects_invalid_profiles(self):
+        invalid = [
+            {"name": "thumb", "quality": True},
+            {"name": "thumb", "quality": 0},
+            {"name": "thumb", "quality": 96},
+            {"name": "thumb", "quality": "50"},
+            {"name": "thumb", "max_width": True},
+            {"name": "thumb", "max_height": 0},
+            {"name": "thumb", "format": "GIF"},
+            {"name": "thumb", "crop": True},
+            {"name": "Thumb"},
+            {"quality": 50},
+            "thumb",
+        ]
+        for profile in invalid:
+            with self.subTest(profile=profile):
+                with self.assertRaises(ValueError):
+                    parse_output_profiles([profile])
+
+    def test_rejects_invalid_lists(self):
+        for profiles in [
+            [],
+            {"name": "thumb"},
+            [{"name": "thumb"}, {"name": "thumb"}],
+            [{"name": f"p{i}"} for i in range(11)],
+        ]:
+            with self.subTest(profiles=profiles):
+                with self.assertRaises(ValueError):
+                    parse_output_profiles(profiles)
+
+
+class RenderVariantTests(SimpleTestCase):
+    def test_converts_modes_the_format_cannot_store(self):
+        for mode, image_format, expected in [
+            ("CMYK", "PNG", "RGB"),
+            ("RGBA", "JPEG", "RGB"),
+            ("LA", "JPEG", "RGB"),
+            ("P", "PNG", "P"),
+        ]:
+            with self.subTest(mode=mode, format=image_format):
+                source = PILImage.new(mode, (40, 30))
+                output = render_variant(
+                    source, {"name": "full", "format": image_format, "quality": 50}
+                )
+                variant = PILImage.open(output)
+                self.assertEqual(variant.format, image_format)
+                self.assertEqual(variant.mode, expected)
+
+    def test_fits_within_max_size(self):
+        source = PILImage.new("RGB", (400, 100))
+        source.format = "JPEG"
+        output = render_variant(
+            source,
+            {"name": "thumb", "max_width": 100, "max_height": 100, "quality": 50},
+        )
+        self.assertEqual(PILImage.open(output).size, (100, 25))
@@ -0,0 +1,202 @@
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import uuid
+from datetime import timedelta
+from unittest import skipIf, skipUnless
+
+from ulid2 import generate_ulid_as_uuid
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from imgur.jobs.models import ProcessingJob, Image
+from imgur.jobs.retention import (
+    apply_retention,
+    archive_jobs,
+    create_image_partitions,
+    drop_image_partitions,
+    image_partitions,
+    ulid_floor,
+)
+from imgur.jobs.tasks import archive_old_jobs
+
+
+def ulid_at(moment):
+    """A ULID as generated at the given time"""
+    return uuid.UUID(bytes=ulid_floor(moment).bytes[:6] + os.urandom(10))
+
+
+class UlidFloorTests(TestCase):
+    def test_orders_with_generated_ids(self):
+        now = timezone.now()
+        generated = generate_ulid_as_uuid()
+        self.assertLessEqual(ulid_floor(now - timedelta(milliseconds=1)), generated)
+        self.assertGreater(ulid_floor(now + timedelta(seconds=1)), generated)
+
+
+class ArchiveJobsTests(TestCase):
+    def setUp(self):
+        self.archive_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.archive_dir)
+        self.old = timezone.now() - timedelta(days=40)
+
+    def create_job(self, created_at, images, status=ProcessingJob.STATUS_COMPLETED):
+        job = ProcessingJob.objects.create(id=ulid_at(created_at), status=status)
+        for i in range(images):
+            Image.objects.create(
+                id=ulid_at(created_at),
+                job=job,
+                product_name="SKU1",
+                input_url=f"https://example.com/{job.id}/{i}.jpg",
+            )
+        return job
+
+    def read_archives(self):
+        lines = []
+        for name in sorted(os.listdir(self.archive_dir)):
+            with gzip.open(os.path.join(self.archive_dir, name), "rt") as f:
+                lines.extend(json.loads(line) for line in f)
+        return lines
+
+    def test_archives_and_deletes_old_finished_jobs(self):
+        archived = [
+            self.create_job(self.old, 3),
+            self.create_job(self.old, 0, status=ProcessingJob.STATUS_CANCELLED),
+            self.create_job(self.old, 2),
+        ]
+        running = self.create_job(self.old, 1, status=ProcessingJob.STATUS_PAUSED)
+        recent = self.create_job(timezone.now(), 1)
+
+        # A job line followed by the lines of its images, in id order
+        expected = []
+        for job in sorted(archived, key=lambda job: job.id):
+            expected.append(("job", str(job.id)))
+            for image_id in sorted(job.images.values_list("id", flat=True)):
+                expected.append(("image", str(image_id)))
+
+        self.assertEqual(archive_jobs(30, self.archive_dir, batch_size=2), 3)
+
+        self.assertEqual(
+            [
+                (kind, line[kind]["id"])
+                for line in self.read_archives()
+                for kind in line
+            ],
+            expected,
+        )
+        self.assertCountEqual(
+            ProcessingJob.objects.values_list("id", flat=True),
+            [running.id, recent.id],
+        )
+        self.assertEqual(Image.objects.count(), 2)
+
+    def test_deletes_images_in_batches(self):
+        self.create_job(self.old, 5)
+
+        with CaptureQueriesContext(connection) as queries:
+            archive_jobs(30, self.archive_dir, batch_size=2)
+
+        image_deletes = [
+            query
+            for query in queries.captured_queries
+            if query["sql"].startswith(
+                'DELETE FROM "jobs_image" WHERE "jobs_image"."id" IN'
+            )
+        ]
+        self.assertEqual(len(image_deletes), 3)
+        self.assertFalse(Image.objects.exists())
+
+    def test_dry_run(self):
+        self.create_job(self.old, 2)
+
+        self.assertEqual(archive_jobs(30, self.archive_dir, 500, dry_run=True), 1)
+        self.assertEqual(Image.objects.count(), 2)
+        self.assertEqual(os.listdir(self.archive_dir), [])
+
+
+class ImagePartitionTests(TestCase):
+    def partition_of(self, image_id):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT tableoid::regclass::text FROM jobs_image WHERE id = %s",
+                [str(image_id)],
+            )
+            return cursor.fetchone()[0]
+
+    def create_partition(self, name, start, end):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE TABLE {name} PARTITION OF jobs_image "
+                "FOR VALUES FROM (%s) TO (%s)",
+                [str(ulid_floor(start)), str(ulid_floor(end))],
+            )
+
+    @skipIf(connection.vendor == "postgresql", "Image table is partitioned")
+    def test_unpartitioned_table(self):
+        self.assertEqual(image_partitions(), [])
+        self.assertEqual(create_image_partitions(), 0)
+        self.assertEqual(drop_image_partitions(30), 0)
+
+    @skipUnless(connection.vendor == "postgresql", "Needs PostgreSQL")
+    def test_creates_partitions_ahead(self):
+        self.assertEqual(create_image_partitions(months_ahead=2), 2)
+        self.assertEqual(create_image_partitions(months_ahead=2), 0)
+
+        job = ProcessingJob.objects.create()
+        next_month = (timezone.now().replace(day=1) + timedelta(days=32)).replace(day=2)
+        image = Image.objects.create(
+            id=ulid_at(next_month), job=job, input_url="https://example.com/a.jpg"
+        )
+        self.assertEqual(self.partition_of(image.id), f"jobs_image_p{next_month:%Y%m}")
+        current = Image.objects.create(job=job, input_url="https://example.com/b.jpg")
+        self.assertEqual(self.partition_of(current.id), "jobs_image_legacy")
+
+    @skipUnless(connection.vendor == "postgresql", "Needs PostgreSQL")
+    def test_drops_empty_old_partitions(self):
+        now = timezone.now()
+        with connection.cursor() as cursor:
+            cursor.execute("ALTER TABLE jobs_image DETACH PARTITION jobs_image_legacy")
+        self.create_partition(
+            "jobs_image_old1", now - timedelta(days=90), now - timedelta(days=60)
+        )
+        self.create_partition(
+            "jobs_image_old2", now - timedelta(days=60), now - timedelta(days=31)
+        )
+        self.create_partition(
+            "jobs_image_recent", now - timedelta(days=31), now + timedelta(days=1)
+        )
+        job = ProcessingJob.objects.create()
+        Image.objects.create(
+            id=ulid_at(now - timedelta(days=70)),
+            job=job,
+            input_url="https://example.com/a.jpg",
+        )
+
+        self.assertEqual(drop_image_partitions(30), 1)
+        self.assertCountEqual(
+            [name for name, _ in image_partitions()],
+            ["jobs_image_old1", "jobs_image_recent", "jobs_image_default"],
+        )
+
+
+class ApplyRetentionTests(TestCase):
+    @override_settings(RETENTION_ARCHIVE_DIR="")
+    def test_keeps_jobs_without_archive_dir(self):
+        job = ProcessingJob.objects.create(
+            id=ulid_at(timezone.now() - timedelta(days=40)),
+            status=ProcessingJob.STATUS_COMPLETED,
+        )
+
+        self.assertEqual(apply_retention()["archived_jobs"], 0)
+        self.assertTrue(ProcessingJob.objects.filter(id=job.id).exists())
+        with self.assertRaises(ImproperlyConfigured):
+            archive_jobs(30, "", 500)
+
+    def test_archive_task_is_acknowledged_on_receipt(self):
+        self.assertFalse(archive_old_jobs.acks_late)
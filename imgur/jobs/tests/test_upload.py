@@ -0,0 +1,161 @@
+import json
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from imgur.jobs import tasks
+from imgur.jobs.benchmarking import InlineBroker
+from imgur.jobs.models import ProcessingJob
+
+CSV = (
+    "S. No.,Product Name,Input Image Urls\n"
+    '1,SKU1,"https://example.com/a.jpg, https://example.com/b.jpg,"\n'
+    "2,SKU2,https://example.com/c.jpg\n"
+)
+
+
+def csv_file(content=CSV, name="products.csv"):
+    return SimpleUploadedFile(name, content.encode(), "text/csv")
+
+
+def product_urls(job):
+    return sorted(job.images.values_list("product_name", "input_url"))
+
+
+EXPECTED_URLS = [
+    ("SKU1", "https://example.com/a.jpg"),
+    ("SKU1", "https://example.com/b.jpg"),
+    ("SKU2", "https://example.com/c.jpg"),
+]
+
+
+class UploadTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.broker = InlineBroker()
+
+    def post(self, path, data, **kwargs):
+        with self.broker.capture():
+            return self.client.post(path, data, **kwargs)
+
+    def test_upload_csv(self):
+        response = self.post("/api/upload/", {"file": csv_file()})
+
+        self.assertEqual(response.status_code, 201)
+        job = ProcessingJob.objects.get(id=response.json()["request_id"])
+        self.assertEqual(product_urls(job), EXPECTED_URLS)
+        self.assertEqual(self.broker.dispatched, 1)
+
+    def test_rows_without_urls(self):
+        content = 'S. No.,Product Name,Input Image Urls\n1,SKU1,\n2,SKU2," ,"\n'
+        response = self.post("/api/upload/", {"file": csv_file(content)})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.json(), {"file": ["Every row must have input image URLs"]}
+        )
+
+        response = self.post("/api/upload/batch/", {"files": [csv_file(content)]})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.json(),
+            {"files": ["products.csv: Every row must have input image URLs"]},
+        )
+        self.assertFalse(ProcessingJob.objects.exists())
+
+    def test_batch_json(self):
+        payload = {
+            "jobs": [
+                {
+                    "priority": ProcessingJob.PRIORITY_HIGH,
+                    "products": [
+                        {
+                            "product_name": "SKU1",
+                            "input_urls": ["https://example.com/a.jpg"],
+                        }
+                    ],
+                },
+                {
+                    "webhook_url": "https://example.com/hook",
+                    "products": [
+                        {
+                            "product_name": "SKU2",
+                            "input_urls": [
+                                "https://example.com/b.jpg",
+                                "https://example.com/c.jpg",
+                            ],
+                        }
+                    ],
+                },
+            ]
+        }
+        response = self.post("/api/upload/batch/", payload, format="json")
+
+        self.assertEqual(response.status_code, 201)
+        high, normal = [
+            ProcessingJob.objects.get(id=job_id)
+            for job_id in response.json()["request_ids"]
+        ]
+        self.assertEqual(high.priority, ProcessingJob.PRIORITY_HIGH)
+        self.assertEqual(high.total_images, 1)
+        self.assertEqual(normal.priority, ProcessingJob.PRIORITY_NORMAL)
+        self.assertEqual(normal.webhook_url, "https://example.com/hook")
+        self.assertEqual(normal.total_images, 2)
+
+    def test_batch_ndjson(self):
+        lines = [
+            {"products": [{"product_name": f"SKU{i}", "input_urls": [url]}]}
+            for i, url in enumerate(
+                ["https://example.com/a.jpg", "https://example.com/b.jpg"]
+            )
+        ]
+        response = self.post(
+            "/api/upload/batch/",
+            "\n".join(json.dumps(line) for line in lines) + "\n",
+            content_type="application/x-ndjson",
+        )
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.json()["request_ids"]), 2)
+
+        response = self.post(
+            "/api/upload/batch/", "{not json\n", content_type="application/x-ndjson"
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_batch_csv_files(self):
+        response = self.post(
+            "/api/upload/batch/",
+            {
+                "files": [csv_file(), csv_file(name="more.csv")],
+                "priority": ProcessingJob.PRIORITY_LOW,
+            },
+        )
+
+        self.assertEqual(response.status_code, 201)
+        jobs = [
+            ProcessingJob.objects.get(id=job_id)
+            for job_id in response.json()["request_ids"]
+        ]
+        self.assertEqual(len(jobs), 2)
+        for job in jobs:
+            self.assertEqual(job.priority, ProcessingJob.PRIORITY_LOW)
+            self.assertEqual(product_urls(job), EXPECTED_URLS)
+
+    def test_batch_dispatches_jobs_as_a_group(self):
+        response = self.post(
+            "/api/upload/batch/",
+            {"files": [csv_file(), csv_file(name="more.csv")]},
+        )
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            [
+                (task, [str(arg) for arg in args])
+                for task, args, *_ in self.broker.queue
+            ],
+            [
+                (tasks.process_images, [job_id])
+                for job_id in response.json()["request_ids"]
+            ],
+        )
@@ -0,0 +1,112 @@
+"""
+Opt-in OpenTelemetry tracing of jobs, from upload through every image stage.
+
+Nothing is imported or recorded unless TRACING_ENABLED is set; spans are then
+a shared no-op context manager.
+"""
+
+import logging
+from contextlib import nullcontext
+
+from celery.signals import before_task_publish
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+logger = logging.getLogger(__name__)
+
+
+class NoopSpan:
+    def set_attribute(self, key, value):
+        pass
+
+
+_noop = nullcontext(NoopSpan())
+_provider = None
+_tracer = None
+
+
+class RequestGetter:
+    """Reads propagated trace headers from a Celery task request"""
+
+    def get(self, carrier, key):
+        # Workers merge message headers into the request, eager calls don't
+        value = getattr(carrier, key, None) or (carrier.headers or {}).get(key)
+        return [value] if value is not None else None
+
+    def keys(self, carrier):
+        return []
+
+
+def _exporter():
+    if settings.TRACING_EXPORTER == "file":
+        from opentelemetry.sdk.trace.export import ConsoleSpanExporter
+
+        return ConsoleSpanExporter(
+            out=open(settings.TRACING_FILE, "a"),
+            formatter=lambda span: span.to_json(indent=None) + "\n",
+        )
+    if settings.TRACING_EXPORTER == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import (
+            OTLPSpanExporter,
+        )
+
+        return OTLPSpanExporter(endpoint=settings.TRACING_OTLP_ENDPOINT)
+    raise ImproperlyConfigured(
+        f"Unknown TRACING_EXPORTER: {settings.TRACING_EXPORTER!r}"
+    )
+
+
+def get_tracer():
+    global _provider, _tracer
+    if _tracer is None:
+        from opentelemetry import trace
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+
+        _provider = TracerProvider(
+            resource=Resource.create({"service.name": settings.TRACING_SERVICE_NAME})
+        )
+        _provider.add_span_processor(BatchSpanProcessor(_exporter()))
+        trace.set_tracer_provider(_provider)
+        _tracer = trace.get_tracer(__name__)
+        logger.info("Tracing enabled with %s exporter", settings.TRACING_EXPORTER)
+    return _tracer
+
+
+def span(name, **attributes):
+    """Span as a child of the current one"""
+    if not settings.TRACING_ENABLED:
+        return _noop
+    return get_tracer().start_as_current_span(name, attributes=attributes)
+
+
+def task_span(name, task, **attributes):
+    """Span continuing the trace propagated in a Celery task's headers"""
+    if not settings.TRACING_ENABLED:
+        return _noop
+    from opentelemetry import context
+    from opentelemetry.propagate import extract
+
+    # Eagerly executed tasks carry no headers and stay in the caller's trace
+    parent = extract(
+        task.request, context=context.get_current(), getter=RequestGetter()
+    )
+    return get_tracer().start_as_current_span(
+        name, context=parent, attributes=attributes
+    )
+
+
+def shutdown():
+    """Flush pending spans, e.g. before a worker process exits"""
+    if _provider is not None:
+        _provider.shutdown()
+
+
+@before_task_publish.connect
+def inject_trace_context(headers=None, **kwargs):
+    if settings.TRACING_ENABLED and headers is not None:
+        from opentelemetry.propagate import inject
+
+        inject(headers)
@@ -0,0 +1,9 @@
+from prometheus_client import CONTENT_TYPE_LATEST
+
+from django.http import HttpResponse
+
+from imgur.jobs.metrics import render_metrics
+
+
+def metrics(request):
+    return HttpResponse(render_metrics(), content_type=CONTENT_TYPE_LATEST)
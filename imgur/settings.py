@@ -12,10 +12,9 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 
 from pathlib import Path
 import os
-import cloudinary
-import cloudinary.uploader
-import cloudinary.api
 import dj_database_url
+from celery.schedules import crontab
+from kombu import Queue
 
 from dotenv import load_dotenv
 
@@ -56,7 +55,6 @@ INSTALLED_APPS = [
     "rest_framework",
     "drf_yasg",
     "django_celery_results",
-    "cloudinary",
     "imgur.jobs",
 ]
 
@@ -112,6 +110,20 @@ else:
         }
     }
 
+if not DEBUG:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.environ.get("CACHE_URL", "redis://localhost:6379/1"),
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -157,23 +169,126 @@ CELERY_BROKER_URL = "redis://localhost:6379/0"
 CELERY_ACCEPT_CONTENT = ["json"]
 CELERY_TASK_SERIALIZER = "json"
 CELERY_RESULT_BACKEND = "django-db"
+# Run tasks inline in the web process instead of on workers, e.g. to load test
+# a single server without Redis; never in production
+CELERY_TASK_ALWAYS_EAGER = os.environ.get("CELERY_TASK_ALWAYS_EAGER") == "true"
+
+# Job scheduling
+# Jobs are routed to a queue by size so that small interactive jobs never wait
+# behind a large batch. Run dedicated workers per queue in production, e.g.
+#   celery -A imgur worker -Q small_jobs
+#   celery -A imgur worker -Q large_jobs
+JOB_SMALL_QUEUE = "small_jobs"
+JOB_LARGE_QUEUE = "large_jobs"
+JOB_SMALL_MAX_IMAGES = int(os.environ.get("JOB_SMALL_MAX_IMAGES", 500))
+
+# Images are processed in chunks; each job keeps at most
+# JOB_CHUNK_WINDOW * <priority weight> chunks in flight so that concurrent
+# jobs on the same queue are interleaved instead of run back to back.
+JOB_CHUNK_SIZE = int(os.environ.get("JOB_CHUNK_SIZE", 25))
+JOB_CHUNK_WINDOW = int(os.environ.get("JOB_CHUNK_WINDOW", 1))
+JOB_PRIORITY_WEIGHTS = {"LOW": 1, "NORMAL": 2, "HIGH": 4}
+# Redis transport priorities, lower is served first
+JOB_CELERY_PRIORITIES = {"LOW": 6, "NORMAL": 3, "HIGH": 0}
+
+CELERY_TASK_DEFAULT_QUEUE = "celery"
+CELERY_TASK_QUEUES = [
+    Queue(CELERY_TASK_DEFAULT_QUEUE),
+    Queue(JOB_SMALL_QUEUE),
+    Queue(JOB_LARGE_QUEUE),
+]
+CELERY_BROKER_TRANSPORT_OPTIONS = {
+    "queue_order_strategy": "priority",
+    "priority_steps": list(range(10)),
+    "sep": ":",
+}
+# Don't let a worker hoard prefetched chunks of one job while others wait
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+CELERY_TASK_ACKS_LATE = True
+
+# Processing jobs without a chunk starting for this many seconds are considered
+# stalled and re-dispatched by the sweeper, run with: celery -A imgur beat.
+# Jobs with dispatched chunks that didn't start yet are waiting in a queue and
+# left alone however long the wait. A job whose queued chunks were lost with
+# the broker's data is dispatched again by pausing and resuming it.
+JOB_STALL_TIMEOUT = int(os.environ.get("JOB_STALL_TIMEOUT", 1800))
+CELERY_BEAT_SCHEDULE = {
+    "sweep-stalled-jobs": {
+        "task": "imgur.jobs.tasks.sweep_stalled_jobs",
+        "schedule": int(os.environ.get("JOB_SWEEP_INTERVAL", 60)),
+    },
+    "archive-old-jobs": {
+        "task": "imgur.jobs.tasks.archive_old_jobs",
+        "schedule": crontab(hour=3, minute=0),
+    },
+}
 
-
+# Retention
+# Finished jobs older than RETENTION_JOB_DAYS are archived to
+# RETENTION_ARCHIVE_DIR and deleted; task results are kept RETENTION_RESULT_DAYS.
+# The archive directory must be on durable storage, e.g. a persistent disk
+# rather than the worker's ephemeral filesystem; jobs are kept until it is set.
+RETENTION_JOB_DAYS = int(os.environ.get("RETENTION_JOB_DAYS", 30))
+RETENTION_RESULT_DAYS = int(os.environ.get("RETENTION_RESULT_DAYS", 7))
+RETENTION_ARCHIVE_DIR = os.environ.get("RETENTION_ARCHIVE_DIR", "")
+RETENTION_BATCH_SIZE = int(os.environ.get("RETENTION_BATCH_SIZE", 500))
+# Results are pruned in batches by the archive task instead of Celery's
+# unbatched daily backend cleanup
+CELERY_RESULT_EXPIRES = None
+
+# Metrics
+# Workers expose Prometheus metrics on this port when set. With prefork workers
+# or several gunicorn workers, also set PROMETHEUS_MULTIPROC_DIR so that
+# metrics of all processes are aggregated.
+METRICS_WORKER_PORT = int(os.environ.get("METRICS_WORKER_PORT", 0)) or None
+
+# Tracing
+# Opt-in OpenTelemetry spans per job, chunk and image stage. The "file"
+# exporter appends JSON lines to TRACING_FILE, "otlp" sends spans to a collector.
+TRACING_ENABLED = os.environ.get("TRACING_ENABLED", "").lower() in ("1", "true")
+TRACING_EXPORTER = os.environ.get("TRACING_EXPORTER", "file")
+TRACING_FILE = os.environ.get("TRACING_FILE", os.path.join(BASE_DIR, "traces.jsonl"))
+TRACING_OTLP_ENDPOINT = os.environ.get(
+    "TRACING_OTLP_ENDPOINT", "http://localhost:4318/v1/traces"
+)
+TRACING_SERVICE_NAME = os.environ.get("TRACING_SERVICE_NAME", "imgur")
+
+# Worker memory
+# Images of a chunk are processed by WORKER_IMAGE_CONCURRENCY threads. Decoding
+# is admitted only while the estimated size of the decoded images held by the
+# worker process stays within WORKER_MEMORY_BUDGET_MB (0 for no limit); other
+# threads wait, and no new downloads start while the budget is used up. Size it
+# as the container memory divided by the worker concurrency, minus a baseline.
+WORKER_IMAGE_CONCURRENCY = int(os.environ.get("WORKER_IMAGE_CONCURRENCY", 1))
+WORKER_MEMORY_BUDGET_MB = int(os.environ.get("WORKER_MEMORY_BUDGET_MB", 1024))
+
+# Image downloads
+DOWNLOAD_CONNECT_TIMEOUT = float(os.environ.get("DOWNLOAD_CONNECT_TIMEOUT", 5))
+DOWNLOAD_READ_TIMEOUT = float(os.environ.get("DOWNLOAD_READ_TIMEOUT", 30))
+# URLs that failed permanently are failed without a request for this long.
+# Hosts refusing connections HOST_FAILURE_THRESHOLD times in a row are skipped
+# for HOST_CIRCUIT_TTL seconds.
+NEGATIVE_CACHE_URL_TTL = int(os.environ.get("NEGATIVE_CACHE_URL_TTL", 3600))
+HOST_FAILURE_THRESHOLD = int(os.environ.get("HOST_FAILURE_THRESHOLD", 5))
+HOST_CIRCUIT_TTL = int(os.environ.get("HOST_CIRCUIT_TTL", 300))
+
+
+# Cloudinary is configured by imgur.jobs.storage.CloudinaryStorage when first
+# used, so that processes not uploading images don't import it
 CLOUDINARY_STORAGE = {
     "CLOUD_NAME": os.getenv("CLOUDINARY_CLOUD_NAME", ""),
     "API_KEY": os.getenv("CLOUDINARY_API_KEY", ""),
     "API_SECRET": os.getenv("CLOUDINARY_API_SECRET", ""),
 }
 
-cloudinary.config(
-    cloud_name=CLOUDINARY_STORAGE["CLOUD_NAME"],
-    api_key=CLOUDINARY_STORAGE["API_KEY"],
-    api_secret=CLOUDINARY_STORAGE["API_SECRET"],
-    secure=True,  # Always use HTTPS
-)
-
 DEFAULT_FILE_STORAGE = "cloudinary_storage.storage.MediaCloudinaryStorage"
 
+# Where processed images are stored; use imgur.jobs.storage.StubStorage to
+# run the pipeline without Cloudinary (benchmarks, load tests)
+IMAGE_STORAGE_BACKEND = os.environ.get(
+    "IMAGE_STORAGE_BACKEND", "imgur.jobs.storage.CloudinaryStorage"
+)
+
 LOGGING = {
     "version": 1,
     "disable_existing_loggers": False,
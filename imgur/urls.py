@@ -6,6 +6,7 @@ from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
 
 from imgur.api import urls as api_urls
+from imgur.jobs import views as job_views
 
 schema_view = get_schema_view(
     openapi.Info(
@@ -31,4 +32,5 @@ urlpatterns = [
     path("", schema_view.with_ui("redoc", cache_timeout=0), name="schema-redoc"),
     path("admin/", admin.site.urls),
     path("api/", include(api_urls)),
+    path("metrics", job_views.metrics, name="metrics"),
 ]